@@ -1,5 +1,8 @@
 import regex as re
 import requests
+import hashlib
+import json
+import os
 from itertools import chain
 import math
 from collections import Counter
@@ -12,6 +15,7 @@ import io
 import difflib
 import unidecode
 from tqdm import tqdm
+from SPUB_http_client import get_http_client
 import gspread as gs
 from gspread_dataframe import set_with_dataframe, get_as_dataframe
 
@@ -29,20 +33,97 @@ def give_fake_id(entities, last_number=0, retro=False, retro_filename=''):
             fake_id += 1
     return fake_id
 
+def canonical_string(value):
+    return ' '.join(str(value).lower().split()) if value else ''
+
+def first_value(elements, attribute='value'):
+    return getattr(elements[0], attribute) if elements else ''
+
+# pola encji, z których liczymy stały identyfikator (FakeIds), wg rodzaju encji
+entity_id_keys = {
+    'places': lambda e: [first_value(e.periods, 'name')],
+    'people': lambda e: [first_value(e.names), e.viaf, e.birth_date_and_place.date_from if e.birth_date_and_place else '', e.death_date_and_place.date_from if e.death_date_and_place else ''],
+    'institutions': lambda e: [first_value(e.names), e.viaf],
+    'events': lambda e: [first_value(e.names), e.year, e.place if isinstance(e.place, str) else getattr(e.place, 'id', '')],
+    'publishing_series': lambda e: [first_value(e.titles)],
+    'creative_works': lambda e: [e.author_id, first_value(e.titles)],
+    'journals': lambda e: [first_value(e.titles), e.issn],
+    'journal_items': lambda e: [e.elb_id, getattr(e.title, 'value', e.title)],
+    'books': lambda e: [e.elb_id, getattr(e.title, 'value', e.title)],
+    }
+
+class FakeIds:
+    # stałe identyfikatory encji bez id z Wikidaty zamiast kolejnych numerów z give_fake_id: fake_id_{rodzaj}_{md5 klucza}
+    # klucz to rodzaj i znormalizowane pola encji (entity_id_keys), a dla rekordów retro także ich id z tomu (Qretro_...),
+    # więc id nie zależy od kolejności encji ani od pozostałych rodzajów; każdą część danych można numerować osobno
+    # tabela: id bazowe -> pola bez normalizacji wszystkich encji, które je dostały; różne encje o tym samym kluczu
+    # (np. 'Lublin :' i 'Lublin  :') dostają sufiksy _2, _3... wg pozycji w tabeli; zapisujemy całą tabelę w path (JSON),
+    # a nowe encje dopisujemy za zapisanymi (posortowane między sobą), więc raz nadane id nie przechodzi na inną encję
+    # (encje o identycznych polach rozróżnia tylko kolejność w danych)
+
+    def __init__(self, path=None):
+        self.path = path
+        self.table = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.table = json.load(f)
+
+    def __repr__(self):
+        return "FakeIds(ids={}, collisions={})".format(len(self.table), len(self.collisions()))
+
+    def key(self, entity, kind, normalize=True):
+        values = [entity.id] if entity.id and 'Qretro' in entity.id else []
+        values += entity_id_keys[kind](entity)
+        return json.dumps([kind] + [canonical_string(e) if normalize else str(e or '').strip() for e in values], ensure_ascii=False)
+
+    def assign(self, entities, kind, retro=False, retro_filename=''):
+        prefix = f'retro_{retro_filename}_' if retro else ''
+        pending = []
+        for entity in entities:
+            if not entity.id or entity.id.endswith(('Q', 'QNone')) or 'Qretro' in entity.id:
+                base = f"{prefix}fake_id_{kind}_{hashlib.md5(self.key(entity, kind).encode('utf-8')).hexdigest()}"
+                pending.append((entity, base, self.key(entity, kind, normalize=False)))
+        # nowe klucze dopisujemy za zapisanymi w kolejności sortowania, nie w kolejności danych
+        for (base, raw_key), count in sorted(Counter((base, raw_key) for entity, base, raw_key in pending).items()):
+            keys = self.table.setdefault(base, [])
+            keys.extend([raw_key] * (count - keys.count(raw_key)))
+        seen = Counter()
+        for entity, base, raw_key in pending:
+            position = [idx for idx, e in enumerate(self.table[base]) if e == raw_key][seen[base, raw_key]]
+            seen[base, raw_key] += 1
+            entity.id = base if position == 0 else f'{base}_{position + 1}'
+        return entities
+
+    def collisions(self):
+        return {k:v for k,v in self.table.items() if len(v) > 1}
+
+    def save(self):
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.table, f, ensure_ascii=False, indent=1)
+
+subfield_patterns = {}
+
+def tokenize_marc_field(string, subfield_code='\\$'):
+    # jedno przejście po polu: podpole trwa od swojego kodu do początku następnego kodu
+    if not (pattern := subfield_patterns.get(subfield_code)):
+        pattern = subfield_patterns[subfield_code] = re.compile(f'{subfield_code}.')
+    matches = [(m.start(), m.group(0)) for m in pattern.finditer(string)]
+    ends = [start for start, code in matches[1:]] + [len(string)]
+    subfields = []
+    for (start, code), end in zip(matches, ends):
+        value = string[start:end].split('\n')[0].strip()
+        subfields.append((code, value[len(code):]))
+    return subfields
+
 def marc_parser_for_field(string, subfield_code):
-    subfield_list = re.findall(f'{subfield_code}.', string)
-    for subfield in subfield_list:
-        subfield_escape = re.escape(subfield)
-        string = re.sub(f'({subfield_escape})', r'❦\1', string)
-    string = [e.split('\n')[0].strip() for e in string.split('❦') if e]
-    dictionary_fields = [e for e in string if re.escape(e)[:len(subfield_code)] == subfield_code]
-    dictionary_fields = [{subfield_list[i]:e[len(subfield_list[i]):]} for i, e in enumerate(dictionary_fields)]
-    return dictionary_fields
-
-def harvest_geonames(place_name, geonames_username):  
+    return [{code: value} for code, value in tokenize_marc_field(string, subfield_code)]
+
+def harvest_geonames(place_name, geonames_username, client=None):  
     url = 'http://api.geonames.org/searchJSON?'
     params = {'username': geonames_username, 'q': place_name, 'featureClass': 'P', 'style': 'FULL'}
-    result = requests.get(url, params=params).json()
+    result = (client or get_http_client()).get_json(url, params=params)
     result = max([e for e in result.get('geonames')], key=lambda x: x.get('score'))
     temp_dict = {k:v for k,v in result.items() if k in ['geonameId', 'name', 'countryName', 'lat', 'lng']}
     temp_dict.update({'place name': place_name})
@@ -85,13 +166,28 @@ def parse_java(path):
 
 #%% wikidata
 
-def get_wikidata_label(wikidata_id, list_of_languages):
+def get_wikidata_entity_data(wikidata_id, cache=None, client=None):
+    # odpowiedź Special:EntityData, z cache, jeśli encja jest tam zapisana i aktualna
+    entity = cache.get(wikidata_id) if cache is not None else None
+    if entity is None:
+        r = (client or get_http_client()).get_json(f'https://www.wikidata.org/wiki/Special:EntityData/{wikidata_id}.json')
+        entity = list(r.get('entities').values())[0]
+        if entity.get('id', wikidata_id) != wikidata_id:
+            entity['redirects'] = {'from': wikidata_id, 'to': entity.get('id')}
+        if cache is not None:
+            cache.put(wikidata_id, entity)
+    return {'entities': {entity.get('id', wikidata_id): entity}}
+
+def get_wikidata_label(wikidata_id, list_of_languages, cache=None, client=None):
     if not wikidata_id.startswith('Q'):
         wikidata_id = f'Q{wikidata_id}'
-    r = requests.get(f'https://www.wikidata.org/wiki/Special:EntityData/{wikidata_id}.json').json()
+    r = get_wikidata_entity_data(wikidata_id, cache, client)
     old_wikidata_id = wikidata_id
     if wikidata_id != list(r.get('entities').keys())[0]:
         wikidata_id = list(r.get('entities').keys())[0]
+    # brakująca encja (usunięta z Wikidaty albo nieobecna w indeksie offline): bez etykiety, jak w parse_wikidata_entity
+    if 'missing' in r.get('entities').get(wikidata_id):
+        return (old_wikidata_id, old_wikidata_id, None)
     record_languages = set(r.get('entities').get(wikidata_id).get('labels').keys())
     for language in list_of_languages:
         if language in record_languages:
@@ -99,14 +195,67 @@ def get_wikidata_label(wikidata_id, list_of_languages):
         else:
             return (old_wikidata_id, wikidata_id, r.get('entities').get(wikidata_id).get('labels').get(list(record_languages)[0]).get('value'))
         
-def get_wikidata_coordinates(wikidata_id):
+def get_wikidata_coordinates(wikidata_id, cache=None, client=None):
     if not wikidata_id.startswith('Q'):
         wikidata_id = f'Q{wikidata_id}'
-    r = requests.get(f'https://www.wikidata.org/wiki/Special:EntityData/{wikidata_id}.json').json()
-    lon = r.get('entities').get(wikidata_id).get('claims').get('P625')[0].get('mainsnak').get('datavalue').get('value').get('longitude')
-    lat = r.get('entities').get(wikidata_id).get('claims').get('P625')[0].get('mainsnak').get('datavalue').get('value').get('latitude')
+    # jedyna encja odpowiedzi (po przekierowaniu zapisana pod nowym id); brakująca encja: bez współrzędnych
+    entity = list(get_wikidata_entity_data(wikidata_id, cache, client).get('entities').values())[0]
+    if 'missing' in entity:
+        return ''
+    lon = entity.get('claims').get('P625')[0].get('mainsnak').get('datavalue').get('value').get('longitude')
+    lat = entity.get('claims').get('P625')[0].get('mainsnak').get('datavalue').get('value').get('latitude')
     return f'{lat},{lon}'
 
+wikidata_api_url = 'https://www.wikidata.org/w/api.php'
+
+def parse_wikidata_entity(requested_id, entity, list_of_languages):
+    # wbgetentities zwraca encję pod pytanym id, a przekierowanie w polu 'redirects'
+    old_wikidata_id = entity.get('redirects', {}).get('from', requested_id)
+    if 'missing' in entity:
+        return old_wikidata_id, {'id': old_wikidata_id, 'label': None, 'coordinates': '', 'missing': True}
+    labels = entity.get('labels', {})
+    label = [labels.get(e).get('value') for e in list_of_languages if e in labels] or [e.get('value') for e in labels.values()] or [None]
+    try:
+        coordinates = entity.get('claims').get('P625')[0].get('mainsnak').get('datavalue').get('value')
+        coordinates = f"{coordinates.get('latitude')},{coordinates.get('longitude')}"
+    except (AttributeError, IndexError, TypeError):
+        coordinates = ''
+    return old_wikidata_id, {'id': entity.get('id', requested_id), 'label': label[0], 'coordinates': coordinates}
+
+def wikidata_entities_params(wikidata_ids):
+    return {'action': 'wbgetentities', 'ids': '|'.join(wikidata_ids), 'props': 'labels|claims', 'redirects': 'yes', 'format': 'json'}
+
+def fetch_wikidata_entities_batch(wikidata_ids, api_url=None, client=None):
+    r = (client or get_http_client()).get_json(api_url or wikidata_api_url, params=wikidata_entities_params(wikidata_ids))
+    return r.get('entities', {})
+
+def get_wikidata_entities_batch(wikidata_ids, list_of_languages, api_url=None, client=None):
+    return dict(parse_wikidata_entity(k, v, list_of_languages) for k,v in fetch_wikidata_entities_batch(wikidata_ids, api_url, client).items())
+
+def get_wikidata_entities(wikidata_ids, list_of_languages, batch_size=50, api_url=None, cache=None, client=None):
+    # etykiety, przekierowania i współrzędne (P625) dla max. 50 encji w jednym zapytaniu
+    # z cache bierzemy wszystko, co jest aktualne, do API idą tylko nowe i przeterminowane id
+    wikidata_ids = list(dict.fromkeys(e if e.startswith('Q') else f'Q{e}' for e in wikidata_ids))
+    output = {}
+    if cache is not None:
+        cached = {e: cache.get(e) for e in wikidata_ids}
+        output.update(parse_wikidata_entity(k, v, list_of_languages) for k,v in cached.items() if v is not None)
+        wikidata_ids = [k for k,v in cached.items() if v is None]
+    batches = [wikidata_ids[i:i + batch_size] for i in range(0, len(wikidata_ids), batch_size)]
+    # równoległość i tempo zapytań ogranicza klient HTTP (get_http_client)
+    responses = (client or get_http_client()).map_json([(api_url or wikidata_api_url, wikidata_entities_params(b)) for b in batches])
+    for response in tqdm(responses, total=len(batches)):
+        response = response.get('entities', {})
+        if cache is not None:
+            cache.put_many(response)
+        output.update(parse_wikidata_entity(k, v, list_of_languages) for k,v in response.items())
+    return output
+
+def get_wikidata_labels(wikidata_ids, list_of_languages, batch_size=50, api_url=None, cache=None, client=None):
+    # ten sam kontrakt co get_wikidata_label: (old_id, new_id, label)
+    entities = get_wikidata_entities(wikidata_ids, list_of_languages, batch_size, api_url, cache, client)
+    return [(k, v.get('id'), v.get('label')) for k,v in entities.items()]
+
 #%% from my_fucntions.py
 
 # parser kolumny marc
@@ -584,14 +733,7 @@ def substring_range(s, substring):
         yield (i.start(), i.end())
 
 def marc_parser_dict_for_field(string, subfield_code):
-    subfield_list = re.findall(f'{subfield_code}.', string)
-    for subfield in subfield_list:
-        subfield_escape = re.escape(subfield)
-        string = re.sub(f'({subfield_escape})', r'❦\1', string)
-    string = [e.split('\n')[0].strip() for e in string.split('❦') if e]
-    dictionary_fields = [e for e in string if re.escape(e)[:len(subfield_code)] == subfield_code]
-    dictionary_fields = [{subfield_list[i]:e[len(subfield_list[i]):]} for i, e in enumerate(dictionary_fields)]
-    return dictionary_fields
+    return marc_parser_for_field(string, subfield_code)
 
 
 # szukanie NKC id dla VIAF id
@@ -0,0 +1,88 @@
+import json
+from tqdm import tqdm
+from SPUB_marc_index import MarcIndex
+
+#%% main
+
+def read_json_array(path, chunk_size=1 << 20):
+    # kolejne elementy tablicy JSON czytane z pliku fragmentami (raw_decode), bez wczytywania całości
+    # raw_decode nie współdzieli kluczy między wywołaniami (json.load tak), więc klucze rekordów współdzielimy sami
+    decoder = json.JSONDecoder()
+    keys = {}
+    with open(path, encoding='utf-8') as f:
+        buffer, pos, eof = '', 0, False
+        started = False
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f'{path}: unexpected end of JSON array')
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f'{path}: expected a JSON array')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                error = None
+            except json.JSONDecodeError as e:
+                record, end, error = None, None, e
+            # rekord urwany na końcu bufora (albo liczba, po której nie ma jeszcze separatora): doczytujemy i próbujemy ponownie
+            if (end is None or end == len(buffer) or buffer[end] not in ', \t\r\n]') and not eof:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            if error:
+                raise error
+            if isinstance(record, dict):
+                record = {keys.setdefault(k, k): v for k, v in record.items()}
+            yield record
+            pos = end
+            if pos >= chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+#%% partitions
+
+# rekordy biblio potrzebne w kolejnych etapach preprocess_* (te same warunki co w tych funkcjach)
+# książki są wspólne dla preprocess_institutions i preprocess_books
+biblio_partitions = {
+    'people': lambda record, marc_index: len(record.get('genre_major', [])) == 1 and 'Literature' in record.get('genre_major', []),
+    'books': lambda record, marc_index: 'Book' in record.get('format_major') and record.get('id') in marc_index and any(marc_index.contains(record.get('id'), el) for el in ['264', '260']),
+    'series': lambda record, marc_index: marc_index.contains(record.get('id'), '=490'),
+    'creative_works': lambda record, marc_index: 'Literature' in record.get('genre_major') and 'author' in record,
+    'journals': lambda record, marc_index: record.get('format_major')[0] == 'Journal article',
+    'journal_items': lambda record, marc_index: 'Journal article' in record.get('format_major') and record.get('id') in marc_index,
+    }
+
+def partition_biblio(records, marc_index, partitions=None):
+    # jedno przejście po rekordach: każdy trafia do MarcIndex, a potem do pasujących partycji (w kolejności z pliku)
+    # rekordy spoza wszystkich partycji nie zostają w pamięci (także ich MARC w MarcIndex)
+    # zakładamy unikalne id w biblio (warunki z marc_index sprawdzamy zaraz po dodaniu rekordu)
+    partitions = partitions or biblio_partitions
+    output = {name: [] for name in partitions}
+    for record in records:
+        if not record:
+            continue
+        marc_index.add(record)
+        matched = False
+        for name, condition in partitions.items():
+            if condition(record, marc_index):
+                output[name].append(record)
+                matched = True
+        if not matched:
+            marc_index.discard(record.get('id'))
+    return output
+
+def read_biblio(path):
+    # (partycje, MarcIndex) dla pliku biblio.json; fullrecord jest usuwany po sparsowaniu
+    marc_index = MarcIndex(drop_fullrecord=True)
+    return partition_biblio(tqdm(read_json_array(path)), marc_index), marc_index
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import Counter
+
+#%% main
+
+def record_hash(record, marc_index=None):
+    # treść rekordu biblio razem z jego sparsowanym MARC (fullrecord jest usuwany przy wczytywaniu)
+    rec_id = record.get('id')
+    content = [record]
+    if marc_index is not None:
+        content += [marc_index.get(rec_id), marc_index.get_subjects(rec_id), sorted(marc_index.contained.get(rec_id, ()))]
+    return hashlib.md5(json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+class RecordDelta:
+    # przyrostowe preprocess_*: skrót treści każdego rekordu (wg id) i jego wynik z poprzedniego uruchomienia
+    # preprocess wywołujemy tylko dla rekordów nowych lub zmienionych, pozostałe dicty bierzemy z ./cache/delta/{stage}.pickle
+    # context: skrót wszystkiego poza rekordem, od czego zależy wynik (pliki słownikowe, kod); jego zmiana unieważnia całą pamięć
+    # rekordy odrzucone przez preprocess pamiętamy jako None; kolejność wyniku jest kolejnością rekordów wejściowych
+    # enabled=False: zawsze preprocess(records), bez zapisu
+
+    def __init__(self, stage, context='', path='./cache/delta', enabled=True):
+        self.stage = stage
+        self.context = context
+        self.path = os.path.join(path, f'{stage}.pickle')
+        self.enabled = enabled
+        self.entries = {}
+        self.stats = Counter()
+        if enabled and os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved.get('context') == context:
+                self.entries = saved['entries']
+
+    def __repr__(self):
+        return "RecordDelta(stage={}, records={}, enabled={})".format(self.stage, len(self.entries), self.enabled)
+
+    def run(self, records, preprocess, marc_index=None):
+        if not self.enabled:
+            return preprocess(records)
+        records = [e for e in records if e]
+        hashes = {e.get('id'): record_hash(e, marc_index) for e in records}
+        changed = [e for e in records if self.entries.get(e.get('id'), (None, None))[0] != hashes[e.get('id')]]
+        self.stats['reused'] += len(records) - len(changed)
+        self.stats['processed'] += len(changed)
+        self.stats['removed'] += len(self.entries.keys() - hashes.keys())
+        preprocessed = {e.get('elb_id'): e for e in preprocess(changed)} if changed else {}
+        entries = {}
+        for e in changed:
+            entries[e.get('id')] = (hashes[e.get('id')], preprocessed.get(e.get('id')))
+        self.entries = {rec_id: entries.get(rec_id) or self.entries[rec_id] for rec_id in hashes}
+        self.save()
+        return [entry[1] for entry in self.entries.values() if entry[1] is not None]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump({'context': self.context, 'entries': self.entries}, f, protocol=5)
+        os.replace(self.path + '.tmp', self.path)
+
+    def report(self):
+        print(f"{self.stage} delta: {self.stats['processed']} processed, {self.stats['reused']} reused, {self.stats['removed']} removed")
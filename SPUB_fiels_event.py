@@ -1,7 +1,9 @@
 from datetime import datetime
 import xml.etree.cElementTree as ET
+from SPUB_files_place import PlaceRegistry
 
 class Event:
+    __slots__ = ('id', 'viaf', 'creator', 'status', 'date', 'publishing_date', 'origin', 'headings', 'names', 'type', 'year', 'place', 'date_and_place', 'annotation')
     
     def __init__(self, id_='', viaf='', name='', year='', place='', type_='', annotation='', **kwargs):
         self.id = f"http://www.wikidata.org/entity/Q{id_}"if id_ else None
@@ -22,6 +24,7 @@ class Event:
         self.annotation = annotation
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -44,6 +47,7 @@ class Event:
                     
     
     class EventName(XmlRepresentation):
+        __slots__ = ('value', 'code', 'newest', 'transliteration')
         
         def __init__(self, value):
             self.value = value
@@ -55,6 +59,7 @@ class Event:
             return "EventName('{}')".format(self.value)
         
     class EventDateAndPlace(XmlRepresentation):
+        __slots__ = ('date_from', 'date_from_bc', 'date_to', 'date_to_bc', 'date_uncertain', 'date_in_words', 'places')
         
         def __init__(self, date_from='', date_from_bc='', date_to='', date_to_bc='', date_uncertain='', date_in_words=''):
             self.date_from = date_from
@@ -71,6 +76,7 @@ class Event:
             return "EventDateAndPlace(date_from='{}', date_from_bc='{}', date_uncertain='{}', places='{}')".format(self.date_from, self.date_from_bc, self.date_uncertain, self.places)
         
     class EventLink(XmlRepresentation):
+        __slots__ = ('access_date', 'type', 'link')
         
         def __init__(self, event_instance, link):
             self.access_date = event_instance.date
@@ -95,13 +101,13 @@ class Event:
     
     def connect_with_places(self, list_of_places_class):
         if self.place:
-            correct_place = [e for e in list_of_places_class if [el for el in e.periods if el.name == self.place]]
+            correct_place = PlaceRegistry.from_places(list_of_places_class).find_period(self.place, self.year)
             if correct_place:
                 #jeśli dump z eventami będzie miał miejsca wprowadzone w taki sposób jak persons.json, to wtedy zamiast po nazwie, będziemy łączyć kartoteki po identyfikatorze
-                #docelowo potrzebna funkcja do wskazywania, w którym periodzie mieści się podana data wydarzenia zamiast hardcodowania indeksu 0
-                self.date_and_place.places.append({'id': correct_place[0].id,
-                                    'period': f'{correct_place[0].periods[0].date_from}❦{correct_place[0].periods[0].date_to}',
-                                    'lang': correct_place[0].periods[0].lang})
+                correct_place, period = correct_place
+                self.date_and_place.places.append({'id': correct_place.id,
+                                    'period': f'{period.date_from}❦{period.date_to}',
+                                    'lang': period.lang})
                 
     def to_xml(self):
         event_dict = {k:v for k,v in {'id': self.id, 'status': self.status, 'creator': self.creator, 'creation-date': self.date, 'publishing-date': self.publishing_date, 'origin': self.origin}.items() if v}
@@ -5,6 +5,7 @@ import xml.etree.cElementTree as ET
 
 
 class CreativeWork:
+    __slots__ = ('id', 'creator', 'status', 'date', 'publishing_date', 'origin', 'flags', 'author_id', 'title', 'authors', 'titles', 'headings', 'annotation')
     
     def __init__(self, id_='', author_id='', author_name='', title='', annotation=''):
         self.id = f"http://www.wikidata.org/entity/Q{id_}"if id_ else None
@@ -26,6 +27,7 @@ class CreativeWork:
         self.annotation = annotation
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -37,6 +39,7 @@ class CreativeWork:
                     return title_xml
     
     class CreativeWorkAuthor(XmlRepresentation):
+        __slots__ = ('author_id', 'juvenile', 'co_creator', 'principal', 'author_name')
         
         def __init__(self, author_id, author_name):
             self.author_id = f"http://www.wikidata.org/entity/Q{author_id}"if author_id else None
@@ -49,6 +52,7 @@ class CreativeWork:
             return "CreativeWorkAuthor('{}', '{}')".format(self.author_id, self.author_name)
     
     class CreativeWorkTitle(XmlRepresentation):
+        __slots__ = ('value', 'code', 'newest', 'transliteration')
         
         def __init__(self, value):
             self.value = value
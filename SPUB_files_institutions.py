@@ -12,6 +12,7 @@ from SPUB_additional_functions import get_wikidata_label, get_wikidata_coordinat
 #%% main
 
 class Institution:
+    __slots__ = ('id', 'viaf', 'creator', 'status', 'date', 'publishing_date', 'headings', 'names', 'links', 'newest_name', 'removed', 'annotation')
     
     def __init__(self, id_, viaf, name='', annotation=''):
         self.id = f"http://www.wikidata.org/entity/Q{id_}"if id_ else None
@@ -30,6 +31,7 @@ class Institution:
         self.annotation = annotation
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -43,6 +45,7 @@ class Institution:
                     return link_xml
         
     class InstitutionName(XmlRepresentation):
+        __slots__ = ('value', 'code', 'newest')
         
         def __init__(self, value):
             self.value = value
@@ -53,6 +56,7 @@ class Institution:
             return "InstitutionName('{}')".format(self.value)
     
     class InstitutionLink(XmlRepresentation):
+        __slots__ = ('access_date', 'type', 'link')
         
         def __init__(self, institution_instance, link):
             self.access_date = institution_instance.date
@@ -13,6 +13,7 @@ import sys
 # na potrzeby retro anotacja z journal jest przekazywana dalej na year i number, trzeba to ograc inaczej, zeby taka sytuacja nie wystepowala, gdy nie jest potrzebna
 
 class Journal:
+    __slots__ = ('viaf', 'creator', 'status', 'date', 'publishing_date', 'headings', 'issn', 'removed', 'origin', 'id', 'years', 'titles', 'links', 'newest_journal_number_id', 'annotation', 'years_index', 'numbers_index')
     
     def __init__(self, id_='', viaf='', title='', issn='', years_with_numbers_set=None, character='', annotation='', **kwargs):
         # self.id = f"http://www.wikidata.org/entity/Q{id_}"if id_ else None
@@ -37,10 +38,12 @@ class Journal:
         
         self.newest_journal_number_id = max(self.years, key=lambda x: int(x.year)).numbers[-1].id
         # <newest-journal-number id="journal-number-id-01"/>
+        self.index_years()
         
         self.annotation = annotation
     
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -54,6 +57,7 @@ class Journal:
                     return link_xml
     
     class JournalTitle(XmlRepresentation):
+        __slots__ = ('value', 'code', 'lang', 'newest', 'transliteration')
         
         def __init__(self, value):
             self.value = value
@@ -74,6 +78,7 @@ class Journal:
     #places --> później
         
     class JournalLink(XmlRepresentation):
+        __slots__ = ('access_date', 'type', 'link')
         
         def __init__(self, journal_instance, link):
             self.access_date = journal_instance.date
@@ -96,6 +101,38 @@ class Journal:
         if journal_link:
             self.links.append(self.JournalLink(journal_instance=self, link=journal_link))
     
+    def index_years(self):
+        # year -> JournalYear i (year, number) -> JournalNumber dla connect_with_journals
+        # przy powtórzonym roku zostaje pierwszy, tak jak w [e for e in self.years if ...][0]
+        self.years_index = {}
+        self.numbers_index = {}
+        for journal_year in self.years:
+            self.index_year(journal_year)
+    
+    def index_year(self, journal_year):
+        if journal_year.year in self.years_index:
+            return
+        self.years_index[journal_year.year] = journal_year
+        for journal_number in getattr(journal_year, 'numbers', []):
+            self.numbers_index.setdefault((journal_year.year, journal_number.number), journal_number)
+            
+    def add_year(self, journal_year):
+        self.years.append(journal_year)
+        self.index_year(journal_year)
+        
+    def add_number(self, year, journal_number):
+        journal_year = self.years_index[year]
+        if not hasattr(journal_year, 'numbers'):
+            journal_year.numbers = []
+        journal_year.numbers.append(journal_number)
+        self.numbers_index.setdefault((year, journal_number.number), journal_number)
+    
+    def get_year(self, year):
+        return self.years_index.get(year)
+    
+    def get_number(self, year, number):
+        return self.numbers_index.get((year, number))
+    
     def years_to_xml(self):
         return [e.to_xml() for e in self.years]
     
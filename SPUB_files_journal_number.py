@@ -3,6 +3,7 @@ from datetime import datetime
 
 #%% main
 class JournalNumber:
+    __slots__ = ('number', 'removed', 'origin', 'journal_year_id', 'id', 'headings', 'links', 'status', 'annotation')
     
     def __init__(self, number, journal_year_id='', annotation='', **kwargs):
         self.number = number
@@ -16,6 +17,7 @@ class JournalNumber:
         self.annotation = annotation
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -25,6 +27,7 @@ class JournalNumber:
                     return link_xml
                 
     class JournalNumberLink(XmlRepresentation):
+        __slots__ = ('access_date', 'type', 'link')
         
         def __init__(self, journal_number_instance, link):
             self.access_date = str(datetime.today().date())
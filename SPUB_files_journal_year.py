@@ -4,6 +4,7 @@ from SPUB_files_journal_number import JournalNumber
 
 #%% main
 class JournalYear:
+    __slots__ = ('year', 'removed', 'origin', 'journal_id', 'id', 'characters', 'closed', 'numbers', 'status', 'annotation')
     
     def __init__(self, year, journal_id='', numbers_set=None, character='literary', annotation='', **kwargs):
         self.year = year
@@ -19,6 +20,7 @@ class JournalYear:
         self.annotation = annotation
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -26,6 +28,7 @@ class JournalYear:
                     return ET.Element('character', {'code': self.character})
     
     class JournalYearCharacter(XmlRepresentation):
+        __slots__ = ('character',)
         
         def __init__(self, character):
             self.character = character
@@ -4,11 +4,13 @@ from tqdm import tqdm
 import xml.etree.cElementTree as ET
 from datetime import datetime
 from SPUB_additional_functions import give_fake_id, get_wikidata_label
+from SPUB_files_place import PlaceRegistry
 
 
 #%% main
 
 class Person:
+    __slots__ = ('id', 'viaf', 'creator', 'status', 'date', 'publishing_date', 'sex', 'headings', 'names', 'birth_date_and_place', 'death_date_and_place', 'links', 'annotation')
     
     def __init__(self, id_, viaf, name='', birth_date='', death_date='', birth_place='', death_place='', annotation='', person_heading='', **kwargs):
         self.id = f"http://www.wikidata.org/entity/Q{id_}"if id_ else None
@@ -34,6 +36,7 @@ class Person:
         self.annotation = annotation
     
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -53,6 +56,7 @@ class Person:
                     return link_xml
     
     class PersonName(XmlRepresentation):
+        __slots__ = ('value', 'transliteration', 'code')
         
         def __init__(self, value):
             self.value = value
@@ -63,6 +67,7 @@ class Person:
             return "PersonName('{}')".format(self.value)
         
     class PersonDateAndPlace(XmlRepresentation):
+        __slots__ = ('date_from', 'date_from_bc', 'date_to', 'date_to_bc', 'date_uncertain', 'date_in_words', 'place_id', 'place_period', 'place_lang')
         
         def __init__(self, date_from='', date_from_bc='', date_to='', date_to_bc='', date_uncertain='', date_in_words='', place_id='', place_period='', place_lang=''):
             self.date_from = date_from
@@ -80,6 +85,7 @@ class Person:
             return "PersonDate(date_from='{}', place_id='{}', place_period='{}')".format(self.date_from, self.place_id, self.place_period)
         
     class PersonLink(XmlRepresentation):
+        __slots__ = ('access_date', 'type', 'link')
         
         def __init__(self, person_instance, link, type_):
             self.access_date = person_instance.date
@@ -98,12 +104,13 @@ class Person:
             self.links.append(self.PersonLink(person_instance=self, link=person_link, type_=type_))
             
     def connect_with_places(self, list_of_places_class):
+        places_registry = PlaceRegistry.from_places(list_of_places_class)
         for place in [self.birth_date_and_place, self.death_date_and_place]:
             if place:
-                match_place = [e for e in list_of_places_class if place.place_id == e.id]
+                match_place = places_registry.get(place.place_id)
                 if match_place:
-                    place.place_period = f'{match_place[0].periods[0].date_from}❦{match_place[0].periods[0].date_to}'
-                    place.place_lang = match_place[0].periods[0].lang
+                    place.place_period = f'{match_place.periods[0].date_from}❦{match_place.periods[0].date_to}'
+                    place.place_lang = match_place.periods[0].lang
                     if 'fake' not in place.place_id:
                         self.add_person_link(place.place_id, 'other')
             
@@ -1,9 +1,22 @@
 import xml.etree.cElementTree as ET
 from datetime import datetime
+from collections import defaultdict
+import regex as re
+
+#%% functions
+
+def get_year(value):
+    # rok z początku daty ('1918', '1918-11-11', 1918); None, jeśli brak
+    year = re.match(r'\s*(-?\d{1,4})', str(value)) if value not in (None, '') else None
+    return int(year.group(1)) if year else None
+
+def normalize_place_name(name):
+    return re.sub(r'\s+', ' ', name or '').strip(' :;,.[]').casefold()
 
 #%% classes
     
 class Place:
+    __slots__ = ('id', 'lat', 'lon', 'geonames', 'periods', 'annotation')
     
     def __init__(self, id_, lat, lon, geonames='', name='', annotation='', **kwargs):
         self.id = f"http://www.wikidata.org/entity/Q{id_}"
@@ -16,6 +29,7 @@ class Place:
         self.annotation = annotation
         
     class PlacePeriod:
+        __slots__ = ('date_from', 'date_to', 'name', 'country', 'lang')
         
         def __init__(self, date_from='', date_to='', name='', country='', lang='pl'):
             self.date_from = date_from
@@ -27,6 +41,13 @@ class Place:
         def __repr__(self):
             return "PlacePeriod('{}', '{}', '{}', '{}', '{}')".format(self.date_from, self.date_to, self.name, self.country, self.lang)
         
+        def covers(self, date):
+            # okres bez dat (lub data bez roku) obejmuje wszystko
+            year, year_from, year_to = get_year(date), get_year(self.date_from), get_year(self.date_to)
+            if year is None:
+                return True
+            return (year_from is None or year_from <= year) and (year_to is None or year <= year_to)
+        
         def to_xml(self):
             period_xml = ET.Element('period', {'date-from': self.date_from, 'date-to': self.date_to})
             for attr_tag, value in zip(['name', 'country'], [self.name, self.country]):
@@ -42,7 +63,7 @@ class Place:
         return cls(id_, lat, lon, name=name)
     
     def to_xml(self):
-        place_xml = ET.Element('place', {k:v for k,v in self.__dict__.items() if k not in ('periods', 'annotation') and v})
+        place_xml = ET.Element('place', {k:v for k,v in {'id': self.id, 'lat': self.lat, 'lon': self.lon, 'geonames': self.geonames}.items() if v})
         
         for period in self.periods:
             place_xml.append(period.to_xml())
@@ -54,6 +75,51 @@ class Place:
             
         return place_xml
 
+class PlaceRegistry:
+    # słownik id -> Place, budowany raz dla connect_with_places w Person, Event i Book
+    # przy powtórzeniach zostaje pierwsze miejsce z listy, tak jak w [e for e in places if ...][0]
+    # indeks odwrotny nazwa okresu (dokładna i znormalizowana) -> [(place, period)] do wyboru okresu wg daty
+    
+    def __init__(self, places):
+        self.places = places
+        self.by_id = {}
+        self.by_period_name = defaultdict(list)
+        self.by_normalized_name = defaultdict(list)
+        for place in places:
+            self.by_id.setdefault(place.id, place)
+            for period in place.periods:
+                self.by_period_name[period.name].append((place, period))
+                self.by_normalized_name[normalize_place_name(period.name)].append((place, period))
+                
+    def __repr__(self):
+        return "PlaceRegistry(places={})".format(len(self.places))
+    
+    def __len__(self):
+        return len(self.places)
+    
+    def __iter__(self):
+        return iter(self.places)
+    
+    @classmethod
+    def from_places(cls, places):
+        # metody connect_with_places przyjmują też zwykłą listę miejsc
+        return places if isinstance(places, cls) else cls(places)
+    
+    def get(self, place_id):
+        return self.by_id.get(place_id)
+    
+    def find_period(self, name, date=None):
+        # (place, period) dla nazwy miejsca: najpierw dokładna nazwa, potem znormalizowana
+        # okres obejmujący datę; bez daty lub bez pasującego okresu - pierwszy okres pierwszego miejsca
+        pairs = self.by_period_name.get(name) or self.by_normalized_name.get(normalize_place_name(name))
+        if not pairs:
+            return None
+        if date:
+            for place, period in pairs:
+                if period.covers(date):
+                    return place, period
+        return pairs[0][0], pairs[0][0].periods[0]
+
 # # schemat XML
 # <place geonames="3088171" lon="16.92993" lat="52.40692" id="https://www.wikidata.org/wiki/Q268">
 #                 <period date-from="" date-to="">
@@ -7,6 +7,7 @@ from datetime import datetime
 import xml.etree.cElementTree as ET
 
 class PublishingSeries:
+    __slots__ = ('id', 'creator', 'status', 'date', 'publishing_date', 'origin', 'flags', 'titles', 'annotation')
     
     def __init__(self, id_='', title='', annotation=''):
         self.id = f"http://www.wikidata.org/entity/Q{id_}"if id_ else None
@@ -20,6 +21,7 @@ class PublishingSeries:
         self.annotation = annotation
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -29,6 +31,7 @@ class PublishingSeries:
                     return title_xml
     
     class PublishingSeriesTitle(XmlRepresentation):
+        __slots__ = ('value', 'code', 'newest', 'transliteration')
         
         def __init__(self, value):
             self.value = value
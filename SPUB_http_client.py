@@ -0,0 +1,130 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+import requests
+from requests.adapters import HTTPAdapter
+
+#%% main
+
+class RateLimitedClient:
+    # wspólny klient HTTP dla Wikidaty i GeoNames
+    # pętla asyncio działa w osobnym wątku, więc z kodu synchronicznego używamy get/get_json/map_json
+    # połączenia keep-alive z jednej requests.Session, limit równoległych zapytań i zapytań na sekundę,
+    # ponawianie dla 429/5xx i błędów sieci z losowym (jitter) wykładniczym opóźnieniem lub wg Retry-After
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, concurrency=8, requests_per_second=10, retries=5, backoff=1.0, max_backoff=60, timeout=60):
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'SPUB-ELB (https://github.com/cezary-rosinski/test)'
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self.loop).result()
+        self.next_slot = 0
+
+    def __repr__(self):
+        return "RateLimitedClient(concurrency={}, requests_per_second={}, retries={})".format(self.concurrency, self.requests_per_second, self.retries)
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.concurrency)
+
+    async def throttle(self):
+        # kolejne zapytania startują co 1/rps sekundy; pętla jest jednowątkowa, więc bez blokady
+        if not self.requests_per_second:
+            return
+        now = self.loop.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + 1 / self.requests_per_second
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                    return min(max(delay, 0), self.max_backoff)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.max_backoff))
+
+    async def aget(self, url, params=None):
+        for attempt in range(self.retries + 1):
+            response = None
+            async with self.semaphore:
+                await self.throttle()
+                try:
+                    response = await self.loop.run_in_executor(self.executor, partial(self.session.get, url, params=params, timeout=self.timeout))
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        raise
+            if response is not None and response.status_code not in self.retry_statuses:
+                return response
+            if attempt == self.retries:
+                response.raise_for_status()
+            await asyncio.sleep(self.retry_delay(attempt, response))
+
+    def submit(self, url, params=None):
+        return asyncio.run_coroutine_threadsafe(self.aget(url, params), self.loop)
+
+    def get(self, url, params=None):
+        return self.submit(url, params).result()
+
+    def get_json(self, url, params=None):
+        return self.get(url, params).json()
+
+    def map_json(self, calls):
+        # calls: lista (url, params); wszystkie idą od razu do pętli, wyniki oddajemy w kolejności wejścia
+        futures = [self.submit(url, params) for url, params in calls]
+        for future in futures:
+            yield future.result().json()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.executor.shutdown()
+        self.session.close()
+
+http_client = None
+http_client_kwargs = {}
+# get_http_client bywa wołany z kilku wątków (etapy Pipeline), klienta tworzymy i zamykamy pod blokadą
+http_client_lock = threading.Lock()
+
+def get_http_client(**kwargs):
+    # jeden klient na proces; z innymi argumentami (np. requests_per_second=5) zamyka dotychczasowego
+    # (pętlę z wątkiem, wątki zapytań i Session) i tworzy nowego z nowymi limitami
+    global http_client, http_client_kwargs
+    with http_client_lock:
+        if http_client is not None and kwargs and kwargs != http_client_kwargs:
+            http_client.close()
+            http_client = None
+        if http_client is None:
+            http_client = RateLimitedClient(**kwargs)
+            http_client_kwargs = kwargs
+        return http_client
+
+def close_http_client():
+    # zamyka klienta procesu (np. przed fork w SPUB_xml_export); get_http_client utworzy nowego, jeśli będzie potrzebny
+    global http_client, http_client_kwargs
+    with http_client_lock:
+        if http_client is not None:
+            http_client.close()
+        http_client, http_client_kwargs = None, {}
@@ -0,0 +1,217 @@
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+#%% main
+
+def windows_memory_counters():
+    # GetProcessMemoryInfo z psapi dla bieżącego procesu
+    import ctypes
+    from ctypes import wintypes
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [(name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32, psapi = ctypes.WinDLL('kernel32'), ctypes.WinDLL('psapi')
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+def windows_peak_rss():
+    # PeakWorkingSetSize bieżącego procesu
+    counters = windows_memory_counters()
+    return counters.PeakWorkingSetSize if counters else None
+
+def peak_rss():
+    # szczytowe RSS procesu w bajtach od jego startu (ru_maxrss jest w KB na Linuksie, w bajtach na macOS)
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        return windows_peak_rss()
+    except (OSError, AttributeError):
+        return None
+
+def proc_status(field):
+    # VmRSS z /proc/self/status w bajtach (Linux), None gdzie indziej
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+def darwin_rss():
+    # resident_size z proc_pid_rusage (rusage_info_v0 z libproc)
+    import ctypes
+    class RusageInfo(ctypes.Structure):
+        _fields_ = [('uuid', ctypes.c_uint8 * 16)] + [(name, ctypes.c_uint64) for name in ('user_time', 'system_time', 'pkg_idle_wkups', 'interrupt_wkups', 'pageins', 'wired_size', 'resident_size', 'phys_footprint', 'proc_start_abstime', 'proc_exit_abstime')]
+    info = RusageInfo()
+    if ctypes.CDLL('libproc.dylib').proc_pid_rusage(os.getpid(), 0, ctypes.byref(info)) != 0:
+        return None
+    return info.resident_size
+
+def current_rss():
+    # bieżące RSS procesu w bajtach: /proc na Linuksie, WorkingSetSize na Windows, proc_pid_rusage na macOS
+    if (rss := proc_status('VmRSS')) is not None:
+        return rss
+    try:
+        if sys.platform == 'darwin':
+            return darwin_rss()
+        if resource is None:
+            counters = windows_memory_counters()
+            return counters.WorkingSetSize if counters else None
+    except (OSError, AttributeError):
+        return None
+    return None
+
+class RssSampler:
+    # szczyt RSS w czasie jednego etapu: osobny wątek odczytuje bieżące RSS co interval sekund
+    # każdy etap ma własny wątek, więc etapy równoległe nie zerują sobie pomiaru (działa też na Windows i macOS);
+    # RSS jest wspólne dla procesu, więc szczyt etapu równoległego obejmuje też pamięć pozostałych etapów
+    # szczyt krótszy niż interval może zostać pominięty
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_rss = self.peak = current_rss()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='rss_sampler', daemon=True)
+        if self.peak is not None:
+            self.thread.start()
+
+    def __repr__(self):
+        return "RssSampler(peak={}, interval={})".format(self.peak, self.interval)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = current_rss()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+        return rss
+
+    def stop(self):
+        # (szczyt, RSS na końcu)
+        if self.peak is None:
+            return None, None
+        self.stopped.set()
+        self.thread.join()
+        rss = self.sample()
+        return self.peak, rss
+
+def record_count(value):
+    return len(value) if hasattr(value, '__len__') else None
+
+def measure_start():
+    return time.perf_counter(), time.thread_time(), time.process_time(), RssSampler()
+
+def measure_end(start, records_in=None, records_out=None):
+    # cpu: czas CPU wątku, który wykonuje etap (etapy Pipeline mogą działać równolegle w wątkach);
+    # nie obejmuje wątków pomocniczych etapu (np. zapytań HTTP w places_data), te liczy process_cpu,
+    # który przy etapach równoległych obejmuje też pozostałe etapy
+    # peak_rss: szczyt RSS w czasie etapu (RssSampler); rss_delta: przyrost RSS od początku do końca etapu;
+    # process_peak_rss: szczyt procesu od jego startu (tylko rośnie)
+    wall = time.perf_counter() - start[0]
+    records = records_out if records_out is not None else records_in
+    peak, rss = start[3].stop()
+    return {
+        'wall': round(wall, 3),
+        'cpu': round(time.thread_time() - start[1], 3),
+        'process_cpu': round(time.process_time() - start[2], 3),
+        'peak_rss': peak,
+        'rss_delta': rss - start[3].start_rss if rss is not None else None,
+        'process_peak_rss': peak_rss(),
+        'records_in': records_in,
+        'records_out': records_out,
+        'records_per_second': round(records / wall, 1) if records and wall else None,
+        }
+
+class RunReport:
+    # czas (zegar i CPU), szczytowe RSS etapu i procesu oraz liczba rekordów dla etapów uruchomienia SPUB_main
+    # raport JSON w {path}/run_{start}.json (do porównania kolejnych zrzutów i zmian w kodzie), nadpisywany przy każdym save,
+    # i podsumowanie w konsoli
+    # etapy: preprocess_* (call), budowanie i łączenie encji (stage), pliki eksportu (export_shards(..., report=...))
+    # enabled=False: bez pomiarów i zapisu
+
+    def __init__(self, path='./reports', enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.started = datetime.now()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "RunReport(stages={}, enabled={})".format(len(self.stages), self.enabled)
+
+    @contextmanager
+    def stage(self, name, records_in=None):
+        # records_out ustawiamy w bloku: with report.stage('...', len(data)) as stage: ...; stage['records_out'] = len(wynik)
+        stage = {'name': name, 'records_in': records_in, 'records_out': None}
+        if not self.enabled:
+            yield stage
+            return
+        start = measure_start()
+        try:
+            yield stage
+        except BaseException:
+            stage['failed'] = True
+            raise
+        finally:
+            stage.update(measure_end(start, stage['records_in'], stage['records_out']))
+            self.add(stage)
+
+    def call(self, name, function, *args, **kwargs):
+        # rekordy na wejściu: długość pierwszego argumentu, na wyjściu: długość wyniku
+        with self.stage(name, record_count(args[0]) if args else None) as stage:
+            value = function(*args, **kwargs)
+            stage['records_out'] = record_count(value)
+        return value
+
+    def add(self, stage):
+        if self.enabled:
+            with self.lock:
+                self.stages.append(stage)
+
+    def save(self):
+        if not self.enabled:
+            return None
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f"run_{self.started.strftime('%Y-%m-%d_%H%M%S')}.json")
+        report = {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'stages': self.stages,
+            }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"run report: {path}")
+        return path
+
+    def summary(self):
+        if not self.enabled:
+            return
+        print(f"{'stage':<45}{'wall s':>9}{'cpu s':>9}{'proc cpu':>9}{'peak MB':>9}{'delta MB':>9}{'proc MB':>9}{'in':>9}{'out':>9}{'rec/s':>10}")
+        for stage in self.stages:
+            memory = [stage['peak_rss'], stage['rss_delta'], stage['process_peak_rss']]
+            memory = ['-' if e is None else f"{e / 2**20:.0f}" for e in memory]
+            values = [stage['records_in'], stage['records_out'], stage['records_per_second']]
+            values = ['-' if e is None else e for e in values]
+            print(f"{stage['name'][:44]:<45}{stage['wall']:>9.2f}{stage['cpu']:>9.2f}{stage['process_cpu']:>9.2f}{memory[0]:>9}{memory[1]:>9}{memory[2]:>9}{values[0]:>9}{values[1]:>9}{values[2]:>10}{' FAILED' if stage.get('failed') else ''}")
@@ -15,10 +15,23 @@ import pandas as pd
 import os
 
 from SPUB_preprocessing import preprocess_places, preprocess_people, preprocess_institutions, preprocess_events, preprocess_publishing_series, preprocess_creative_works, preprocess_journal_items, preprocess_journals, preprocess_books, preprocess_retro, get_retro_authorities_sets
-from SPUB_additional_functions import give_fake_id
+from SPUB_additional_functions import FakeIds, parse_mrk, get_wikidata_labels
+from SPUB_marc_index import MarcIndex
+from SPUB_biblio_reader import read_biblio
+from SPUB_snapshots import SnapshotStore
+from SPUB_reference_data import get_reference_data, get_headings_resolver, reference_files
+from SPUB_xml_export import export_jobs, export_shards
+from SPUB_wikidata_cache import WikidataCache
+from SPUB_http_client import close_http_client
+from SPUB_wikidata_offline import WikidataOfflineIndex
+from SPUB_record_store import RecordStore
+from SPUB_delta import RecordDelta
+from SPUB_place_matching import PlaceNameIndex
+from SPUB_pipeline import Pipeline
+from SPUB_instrumentation import RunReport
 
 # from SPUB_kartoteki_klasy import Place, Person, Event, PublishingSeries
-from SPUB_files_place import Place
+from SPUB_files_place import Place, PlaceRegistry
 from SPUB_files_person import Person
 from SPUB_files_institutions import Institution
 from SPUB_fiels_event import Event
@@ -28,38 +41,104 @@ from SPUB_files_journal import Journal
 from SPUB_records_journal_item import JournalItem
 from SPUB_records_book import Book
 
+# liczba procesów zapisujących pliki XML (ELB i retro; 1 = eksport sekwencyjny w bieżącym procesie)
+export_workers = os.cpu_count()
+# maksymalny rozmiar pliku XML w bajtach, oprócz limitu rekordów (None = tylko limit rekordów)
+export_max_bytes = None
+# rekordy (Book, JournalItem) w kolumnowym RecordStore zamiast list obiektów: mniej pamięci, łączenie na kolumnach
+records_store = False
+# zdekodowane pliki wejściowe (i sparsowane biblio) zapisane w ./cache/snapshots, wczytywane ponownie, jeśli pliki się nie zmieniły
+input_snapshots = True
+# preprocess_journal_items i preprocess_books tylko dla rekordów biblio nowych lub zmienionych od poprzedniego uruchomienia (./cache/delta)
+delta_runs = True
+# etapy wczytywania i preprocess z zapisem wyników w ./cache/pipeline; niezależne etapy w pipeline_workers wątkach
+# (preprocess_* to głównie praca CPU, więc wątki przy GIL niewiele dają i zaburzają pomiary run_reports; 1 = po kolei)
+pipeline_checkpoints = True
+pipeline_workers = 1
+# czas, CPU, szczytowa pamięć i liczba rekordów etapów: raport JSON w ./reports i podsumowanie w konsoli
+run_reports = True
+
 
 #%% import data
-with open(r".\elb_input\places.json", encoding='utf-8') as f:
-    import_places = [e for e in json.load(f) if 'publication place' in e.get('roles') or 'event place' in e.get('roles')]
-with open(r".\elb_input\persons.json", encoding='utf-8') as f:
-    import_persons = json.load(f)
-with open(r".\elb_input\corporates.json", encoding='utf-8') as f:
-    import_corporates = json.load(f)
-with open(r".\elb_input\events.json", encoding='utf-8') as f:
-    import_events = json.load(f)
-with open(r".\elb_input\biblio.json", encoding='utf-8') as f:
-    import_biblio = json.load(f)
+run_report = RunReport('./reports', enabled=run_reports)
+snapshots = SnapshotStore('./cache/snapshots', enabled=input_snapshots)
+
+# wczytywanie i preprocess jako etapy Pipeline: wyniki preprocess_* zapisane w ./cache/pipeline,
+# po błędzie w dalszej części skryptu (np. eksporcie) liczone są tylko etapy, których pliki lub kod się zmieniły
+pipeline = Pipeline('./cache/pipeline', workers=pipeline_workers, enabled=pipeline_checkpoints, snapshots=snapshots, run_report=run_report)
+
+pipeline.add('import_places', lambda: [e for e in snapshots.load_json(r".\elb_input\places.json", 'places') if 'publication place' in e.get('roles') or 'event place' in e.get('roles')], sources=[r".\elb_input\places.json"], checkpoint=False)
+pipeline.add('import_persons', lambda: snapshots.load_json(r".\elb_input\persons.json", 'persons'), sources=[r".\elb_input\persons.json"], checkpoint=False)
+pipeline.add('import_corporates', lambda: snapshots.load_json(r".\elb_input\corporates.json", 'corporates'), sources=[r".\elb_input\corporates.json"], checkpoint=False)
+pipeline.add('import_events', lambda: snapshots.load_json(r".\elb_input\events.json", 'events'), sources=[r".\elb_input\events.json"], checkpoint=False)
+
+# biblio.json czytamy strumieniowo i w jednym przejściu dzielimy na rekordy potrzebne w kolejnych etapach
+# każdy fullrecord parsujemy raz dla wszystkich etapów, surowy tekst MARC nie jest już potrzebny
+# wynik etapu: (partycje biblio, MarcIndex)
+pipeline.add('biblio', lambda: snapshots.load('biblio', [r".\elb_input\biblio.json"], lambda: read_biblio(r".\elb_input\biblio.json"), code=[read_biblio, MarcIndex, parse_mrk]), sources=[r".\elb_input\biblio.json"], code=[read_biblio, MarcIndex, parse_mrk], checkpoint=False)
+
+# słowniki z additional_files, wspólne dla wszystkich etapów preprocess_*
+reference_sources = [os.path.join('./additional_files', filename) for filename in reference_files.values()]
+pipeline.add('reference_data', lambda: get_reference_data(snapshots=snapshots), sources=reference_sources, code=[get_reference_data, parse_mrk], checkpoint=False)
     
 #%% preprocess data
 
-places_data = preprocess_places(import_places)
-
-person_data = preprocess_people(import_persons, import_biblio)
-
-institutions_data = preprocess_institutions(import_corporates, import_biblio)
-
-events_data = preprocess_events(import_events)
-
-series_data = preprocess_publishing_series(import_biblio)
-
-creative_works_data = preprocess_creative_works(import_biblio)
-
-journals_data = preprocess_journals(import_biblio)
-
-journal_items_data = preprocess_journal_items(import_biblio)
-
-books_data = preprocess_books(import_biblio, import_places)
+# encje Wikidaty są pobierane tylko dla nowych lub przeterminowanych id
+# bez dostępu do sieci: indeks lokalnego zrzutu Wikidaty zbudowany wcześniej przez build_wikidata_index
+wikidata_offline_index = None # './cache/wikidata_index.sqlite'
+if wikidata_offline_index:
+    wikidata_cache = WikidataOfflineIndex(wikidata_offline_index)
+else:
+    wikidata_cache = WikidataCache('./cache/wikidata.sqlite')
+
+# pamięć delta jest unieważniana po zmianie plików słownikowych (dla książek także places.json) albo kodu preprocess
+preprocess_code = [preprocess_journal_items, get_reference_data, parse_mrk, MarcIndex]
+
+def preprocess_journal_items_delta(biblio, reference_data):
+    import_biblio, marc_index = biblio
+    journal_items_delta = RecordDelta('journal_items', snapshots.key('journal_items', reference_sources, preprocess_code), enabled=delta_runs)
+    journal_items_data = journal_items_delta.run(import_biblio['journal_items'], lambda records: run_report.call('preprocess_journal_items', preprocess_journal_items, records, marc_index), marc_index)
+    journal_items_delta.report()
+    return journal_items_data
+
+def preprocess_books_delta(import_places, biblio, reference_data):
+    import_biblio, marc_index = biblio
+    books_delta = RecordDelta('books', snapshots.key('books', reference_sources + [r".\elb_input\places.json"], preprocess_code + [PlaceNameIndex]), enabled=delta_runs)
+    books_data = books_delta.run(import_biblio['books'], lambda records: run_report.call('preprocess_books', preprocess_books, records, import_places, marc_index, './cache/place_matches.json'), marc_index)
+    books_delta.report()
+    get_headings_resolver().report()
+    return books_data
+
+# bez zapisu: etykiety Wikidaty odświeża WikidataCache (nowe i przeterminowane id) albo indeks offline, a nie klucz etapu
+pipeline.add('places_data', lambda import_places: run_report.call('preprocess_places', preprocess_places, import_places, wikidata_cache), inputs=['import_places'], code=[preprocess_places, get_wikidata_labels, type(wikidata_cache)], checkpoint=False)
+pipeline.add('person_data', lambda import_persons, biblio, reference_data: run_report.call('preprocess_people', preprocess_people, import_persons, biblio[0]['people']), inputs=['import_persons', 'biblio', 'reference_data'], code=[preprocess_people])
+pipeline.add('institutions_data', lambda import_corporates, biblio: run_report.call('preprocess_institutions', preprocess_institutions, import_corporates, biblio[0]['books'], biblio[1]), inputs=['import_corporates', 'biblio'], code=[preprocess_institutions])
+pipeline.add('events_data', lambda import_events: run_report.call('preprocess_events', preprocess_events, import_events), inputs=['import_events'], code=[preprocess_events])
+pipeline.add('series_data', lambda biblio: run_report.call('preprocess_publishing_series', preprocess_publishing_series, biblio[0]['series'], biblio[1]), inputs=['biblio'], code=[preprocess_publishing_series])
+pipeline.add('creative_works_data', lambda biblio: run_report.call('preprocess_creative_works', preprocess_creative_works, biblio[0]['creative_works']), inputs=['biblio'], code=[preprocess_creative_works])
+# bez zapisu: kolejność numerów (zbiory w 'years') po wczytaniu z pickle mogłaby być inna, a od niej zależy m.in. newest_journal_number_id
+pipeline.add('journals_data', lambda biblio: run_report.call('preprocess_journals', preprocess_journals, biblio[0]['journals']), inputs=['biblio'], code=[preprocess_journals], checkpoint=False)
+pipeline.add('journal_items_data', preprocess_journal_items_delta, inputs=['biblio', 'reference_data'], code=preprocess_code)
+# preprocess_places zmienia słowniki z import_places, z których korzysta też preprocess_books
+pipeline.add('books_data', preprocess_books_delta, inputs=['import_places', 'biblio', 'reference_data'], after=['places_data'], code=preprocess_code + [PlaceNameIndex])
+
+preprocessed = pipeline.run(['places_data', 'person_data', 'institutions_data', 'events_data', 'series_data', 'creative_works_data', 'journals_data', 'journal_items_data', 'books_data'])
+pipeline.report()
+snapshots.report()
+
+# Wikidata nie jest już potrzebna: zamykamy klienta HTTP (wątki pętli i zapytań) i cache, zanim eksport utworzy procesy przez fork
+close_http_client()
+wikidata_cache.close()
+
+places_data = preprocessed['places_data']
+person_data = preprocessed['person_data']
+institutions_data = preprocessed['institutions_data']
+events_data = preprocessed['events_data']
+series_data = preprocessed['series_data']
+creative_works_data = preprocessed['creative_works_data']
+journals_data = preprocessed['journals_data']
+journal_items_data = preprocessed['journal_items_data']
+books_data = preprocessed['books_data']
 
 # test save
 # with open('./additional_files/test/books_headings_test.json', 'w', encoding='utf-8') as jfile:
@@ -69,27 +148,45 @@ books_data = preprocess_books(import_biblio, import_places)
 
 #%% create class
 
-places = [Place.from_dict(e) for e in tqdm(places_data)]
-last_number = give_fake_id(places)
-
-persons = [Person.from_dict(e) for e in tqdm(person_data)]
-last_number = give_fake_id(persons, last_number)
-for person in tqdm(persons):
-    person.connect_with_places(places)
+# stałe id encji bez Wikidaty (fake_id_{rodzaj}_{md5}); kolizje zapisujemy w ./cache/fake_ids.json
+fake_ids = FakeIds('./cache/fake_ids.json')
+
+with run_report.stage('build places', len(places_data)) as stage:
+    places = [Place.from_dict(e) for e in tqdm(places_data)]
+    fake_ids.assign(places, 'places')
+    places_registry = PlaceRegistry(places)
+    stage['records_out'] = len(places)
+
+with run_report.stage('build persons', len(person_data)) as stage:
+    persons = [Person.from_dict(e) for e in tqdm(person_data)]
+    fake_ids.assign(persons, 'people')
+    stage['records_out'] = len(persons)
+with run_report.stage('connect persons', len(persons)):
+    for person in tqdm(persons):
+        person.connect_with_places(places_registry)
     
-institutions = [Institution.from_dict(e) for e in tqdm(institutions_data)]
-last_number = give_fake_id(institutions, last_number)
-
-events = [Event.from_dict(e) for e in tqdm(events_data)]
-last_number = give_fake_id(events, last_number)
-for event in tqdm(events):
-    event.connect_with_places(places) 
-
-publishing_series_list = [PublishingSeries.from_dict(e) for e in tqdm(series_data)]
-last_number = give_fake_id(publishing_series_list, last_number)
-
-creative_works = [CreativeWork.from_dict(e) for e in tqdm(creative_works_data)]
-last_number = give_fake_id(creative_works, last_number)
+with run_report.stage('build institutions', len(institutions_data)) as stage:
+    institutions = [Institution.from_dict(e) for e in tqdm(institutions_data)]
+    fake_ids.assign(institutions, 'institutions')
+    stage['records_out'] = len(institutions)
+
+with run_report.stage('build events', len(events_data)) as stage:
+    events = [Event.from_dict(e) for e in tqdm(events_data)]
+    fake_ids.assign(events, 'events')
+    stage['records_out'] = len(events)
+with run_report.stage('connect events', len(events)):
+    for event in tqdm(events):
+        event.connect_with_places(places_registry) 
+
+with run_report.stage('build publishing series', len(series_data)) as stage:
+    publishing_series_list = [PublishingSeries.from_dict(e) for e in tqdm(series_data)]
+    fake_ids.assign(publishing_series_list, 'publishing_series')
+    stage['records_out'] = len(publishing_series_list)
+
+with run_report.stage('build creative works', len(creative_works_data)) as stage:
+    creative_works = [CreativeWork.from_dict(e) for e in tqdm(creative_works_data)]
+    fake_ids.assign(creative_works, 'creative_works')
+    stage['records_out'] = len(creative_works)
 
 persons_to_connect = {}
 for p in persons:
@@ -98,36 +195,57 @@ for p in persons:
         persons_to_connect.update({name.value: p})
 #UWAGA --> jeśli jest to samo nazewnictwo dla różnych id, to zachowujemy ostatnią parę
 #NA PRZYSZŁOŚĆ --> zebrać wszystkie duplikaty nazewnictwa, zbierać w odrębnej zmiennej i rozwiązać ten problem inaczej
-for creative_work in tqdm(creative_works):
-    creative_work.connect_with_persons(persons_to_connect)
+with run_report.stage('connect creative works', len(creative_works)):
+    for creative_work in tqdm(creative_works):
+        creative_work.connect_with_persons(persons_to_connect)
     
-journals = [Journal.from_dict(e) for e in tqdm(journals_data)]
-#UWAGA --> z powodu błędów w danych czasem year == 0
-last_number = give_fake_id(journals, last_number)
+with run_report.stage('build journals', len(journals_data)) as stage:
+    journals = [Journal.from_dict(e) for e in tqdm(journals_data)]
+    #UWAGA --> z powodu błędów w danych czasem year == 0
+    fake_ids.assign(journals, 'journals')
+    stage['records_out'] = len(journals)
     
-journal_items = [JournalItem.from_dict(e) for e in tqdm(journal_items_data)]
-last_number = give_fake_id(journal_items, last_number)
+with run_report.stage('build journal items', len(journal_items_data)) as stage:
+    journal_items = (JournalItem.from_dict(e) for e in tqdm(journal_items_data))
+    journal_items = RecordStore(JournalItem, journal_items) if records_store else list(journal_items)
+    fake_ids.assign(journal_items, 'journal_items')
+    stage['records_out'] = len(journal_items)
 
 journals_to_connect = {}
 for j in journals:
     for title in j.titles:
         journals_to_connect.update({title.value: j})
 
-for journal_item in tqdm(journal_items):
-    journal_item.connect_with_persons(persons_to_connect)
-    journal_item.connect_with_journals(journals_to_connect)
+with run_report.stage('connect journal items', len(journal_items)):
+    if records_store:
+        journal_items.connect_with_persons(persons_to_connect)
+        journal_items.connect_with_journals(journals_to_connect)
+    else:
+        for journal_item in tqdm(journal_items):
+            journal_item.connect_with_persons(persons_to_connect)
+            journal_item.connect_with_journals(journals_to_connect)
     
-books = [Book.from_dict(e) for e in tqdm(books_data)]
-last_number = give_fake_id(books, last_number)
+with run_report.stage('build books', len(books_data)) as stage:
+    books = (Book.from_dict(e) for e in tqdm(books_data))
+    books = RecordStore(Book, books) if records_store else list(books)
+    fake_ids.assign(books, 'books')
+    stage['records_out'] = len(books)
 
 institutions_to_connect = {}
 for i in institutions:
     for name in i.names:
         institutions_to_connect.update({name.value: i.id})
 
-for book in tqdm(books):
-    book.connect_with_persons(persons_to_connect)
-    book.connect_publisher(places, institutions_to_connect)
+with run_report.stage('connect books', len(books)):
+    if records_store:
+        books.connect_with_persons(persons_to_connect)
+        books.connect_publisher(places_registry, institutions_to_connect)
+    else:
+        for book in tqdm(books):
+            book.connect_with_persons(persons_to_connect)
+            book.connect_publisher(places_registry, institutions_to_connect)
+
+fake_ids.save()
 
 #%% enrich classes
 
@@ -139,136 +257,30 @@ for book in tqdm(books):
 # slicing records lists
 # plik zapisów po 50 000 rekordów, pliki kartoteki utworów po 50 000, pozostałe pliki kartotek po 10 000 rekordów
 
+# wszystkie pliki ELB zapisuje jedna pula procesów
+xml_jobs = []
 # places
-step = 10000
-for idx, sublist in enumerate([places[i:i + step] for i in range(0, len(places), step)]):
-    places_xml = ET.Element('pbl')
-    files_node = ET.SubElement(places_xml, 'files')
-    places_node = ET.SubElement(files_node, 'places')
-    for place in tqdm(sublist):
-        places_node.append(place.to_xml())
-        
-    tree = ET.ElementTree(places_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_places_{idx}.xml', encoding='UTF-8')
-
-
+xml_jobs += export_jobs(places, './xml_output', 'places', max_bytes=export_max_bytes, workers=export_workers)
 # persons
-step = 10000
-for idx, sublist in enumerate([persons[i:i + step] for i in range(0, len(persons), step)]):
-    persons_xml = ET.Element('pbl')
-    files_node = ET.SubElement(persons_xml, 'files')
-    people_node = ET.SubElement(files_node, 'people')
-    for person in tqdm(sublist):
-        people_node.append(person.to_xml())
-
-    tree = ET.ElementTree(persons_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_people_{idx}.xml', encoding='UTF-8')
-
-
+xml_jobs += export_jobs(persons, './xml_output', 'people', max_bytes=export_max_bytes, workers=export_workers)
 # institutions
-step = 10000
-for idx, sublist in enumerate([institutions[i:i + step] for i in range(0, len(institutions), step)]):
-    institutions_xml = ET.Element('pbl')
-    files_node = ET.SubElement(institutions_xml, 'files')
-    institutions_node = ET.SubElement(files_node, 'institutions')
-    for institution in tqdm(sublist):
-        institutions_node.append(institution.to_xml())
-    
-    tree = ET.ElementTree(institutions_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_institutions_{idx}.xml', encoding='UTF-8')
-
-
+xml_jobs += export_jobs(institutions, './xml_output', 'institutions', max_bytes=export_max_bytes, workers=export_workers)
 # events
-step = 10000
-for idx, sublist in enumerate([events[i:i + step] for i in range(0, len(events), step)]):
-    events_xml = ET.Element('pbl')
-    files_node = ET.SubElement(events_xml, 'files')
-    events_node = ET.SubElement(files_node, 'events')
-    for event in tqdm(sublist):
-        events_node.append(event.to_xml())
-    
-    tree = ET.ElementTree(events_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_events_{idx}.xml', encoding='UTF-8')
-
-
+xml_jobs += export_jobs(events, './xml_output', 'events', max_bytes=export_max_bytes, workers=export_workers)
 # publishing series
-step = 10000
-for idx, sublist in enumerate([publishing_series_list[i:i + step] for i in range(0, len(publishing_series_list), step)]):
-    publishing_series_list_xml = ET.Element('pbl')
-    files_node = ET.SubElement(publishing_series_list_xml, 'files')
-    publishing_series_list_node = ET.SubElement(files_node, 'publishing-series-list')
-    for publishing_series in tqdm(sublist):
-        publishing_series_list_node.append(publishing_series.to_xml())
-        
-    tree = ET.ElementTree(publishing_series_list_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_publishing_series_list_{idx}.xml', encoding='UTF-8')
-
-
+xml_jobs += export_jobs(publishing_series_list, './xml_output', 'publishing_series_list', max_bytes=export_max_bytes, workers=export_workers)
 # creative works
-step = 50000
-for idx, sublist in enumerate([creative_works[i:i + step] for i in range(0, len(creative_works), step)]):
-    creative_works_xml = ET.Element('pbl')
-    files_node = ET.SubElement(creative_works_xml, 'files')
-    creative_works_node = ET.SubElement(files_node, 'creative_works')
-    for creative_work in tqdm(sublist):
-        creative_works_node.append(creative_work.to_xml())
-    
-    tree = ET.ElementTree(creative_works_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_creative_works_{idx}.xml', encoding='UTF-8')
-
-
+xml_jobs += export_jobs(creative_works, './xml_output', 'creative_works', max_bytes=export_max_bytes, workers=export_workers)
 # journals
-step = 10000
-for idx, sublist in enumerate([journals[i:i + step] for i in range(0, len(journals), step)]):
-    journals_xml = ET.Element('pbl')
-    files_node = ET.SubElement(journals_xml, 'files')
-    journals_node = ET.SubElement(files_node, 'journals')
-    journals_years_node = ET.SubElement(files_node, 'journal-years')
-    journals_numbers_node = ET.SubElement(files_node, 'journal-numbers')
-    for journal in tqdm(sublist):
-        journals_node.append(journal.to_xml())
-        for year_xml in journal.years_to_xml():
-            journals_years_node.append(year_xml)
-        for number_xml in journal.numbers_to_xml():
-            journals_numbers_node.append(number_xml)
-      
-    tree = ET.ElementTree(journals_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_journals_{idx}.xml', encoding='UTF-8')
-
-
-#journal items
-step = 50000
-for idx, sublist in enumerate([journal_items[i:i + step] for i in range(0, len(journal_items), step)]):
-    records_xml = ET.Element('pbl')
-    files_node = ET.SubElement(records_xml, 'records')
-    journal_items_node = ET.SubElement(files_node, 'journal-items')
-    for journal_item in tqdm(sublist):
-        journal_items_node.append(journal_item.to_xml())
-
-    tree = ET.ElementTree(records_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_journal_items_{idx}.xml', encoding='UTF-8')
-
-
-#books
-step = 50000
-for idx, sublist in enumerate([books[i:i + step] for i in range(0, len(books), step)]):
-    records_xml = ET.Element('pbl')
-    files_node = ET.SubElement(records_xml, 'records')
-    books_node = ET.SubElement(files_node, 'books')
-    for book in tqdm(sublist):
-        books_node.append(book.to_xml())
-    
-    tree = ET.ElementTree(records_xml)
-    ET.indent(tree, space="\t", level=0)
-    tree.write(f'./xml_output/import_books_{idx}.xml', encoding='UTF-8')
+xml_jobs += export_jobs(journals, './xml_output', 'journals', max_bytes=export_max_bytes, workers=export_workers)
+# journal items
+xml_jobs += export_jobs(journal_items, './xml_output', 'journal_items', max_bytes=export_max_bytes, workers=export_workers)
+# books
+xml_jobs += export_jobs(books, './xml_output', 'books', max_bytes=export_max_bytes, workers=export_workers)
+export_shards(xml_jobs, export_workers, run_report)
+
+run_report.summary()
+run_report.save()
 
     
 # for i,test_item in enumerate(creative_works):
@@ -374,16 +386,17 @@ for file in tqdm(os.listdir('retro_input')[::-1]):
             retro_pre_persons, retro_pre_places, retro_pre_journals, retro_pre_institutions = get_retro_authorities_sets(retro_data, filename)
     
             retro_places = [Place(id_='', lat='', lon='', name=e) for e in tqdm(retro_pre_places)]
-            last_number = give_fake_id(retro_places, retro=True, retro_filename=filename)
+            fake_ids.assign(retro_places, 'places', retro=True, retro_filename=filename)
+            retro_places_registry = PlaceRegistry(retro_places)
     
             retro_persons = [Person(id_='', viaf='', name=e, annotation=annotation_auth_files) for e in tqdm(retro_pre_persons)]
-            last_number = give_fake_id(retro_persons, last_number, retro=True, retro_filename=filename)
+            fake_ids.assign(retro_persons, 'people', retro=True, retro_filename=filename)
     
             retro_institutions = [Institution(id_='', viaf='', name=e, annotation=annotation_auth_files) for e in tqdm(retro_pre_institutions)]
-            last_number = give_fake_id(retro_institutions, last_number, retro=True, retro_filename=filename)
+            fake_ids.assign(retro_institutions, 'institutions', retro=True, retro_filename=filename)
     
             retro_journals = [Journal(title=e[0], years_with_numbers_set=((retro_year, e[1]),), annotation=annotation_auth_files) for e in tqdm(retro_pre_journals)]
-            last_number = give_fake_id(retro_journals, last_number, retro=True, retro_filename=filename)
+            fake_ids.assign(retro_journals, 'journals', retro=True, retro_filename=filename)
             
             # records preprocessing
             records_prep = preprocess_retro(retro_data, filename, retro_year)
@@ -408,102 +421,48 @@ for file in tqdm(os.listdir('retro_input')[::-1]):
                 for name in i.names:
                     retro_institutions_to_connect.update({name.value: i.id})
     
-            retro_books = [Book.from_retro(e) for e in tqdm(records_prep) if e['rec_type']=='KS']
-            last_number = give_fake_id(retro_books, last_number, retro=True, retro_filename=filename)
+            retro_books = (Book.from_retro(e) for e in tqdm(records_prep) if e['rec_type']=='KS')
+            retro_books = RecordStore(Book, retro_books) if records_store else list(retro_books)
+            fake_ids.assign(retro_books, 'books', retro=True, retro_filename=filename)
     
-            for book in tqdm(retro_books):
-                book.connect_with_persons(retro_persons_to_connect)
-                book.connect_publisher(retro_places, retro_institutions_to_connect)
+            if records_store:
+                retro_books.connect_with_persons(retro_persons_to_connect)
+                retro_books.connect_publisher(retro_places_registry, retro_institutions_to_connect)
+            else:
+                for book in tqdm(retro_books):
+                    book.connect_with_persons(retro_persons_to_connect)
+                    book.connect_publisher(retro_places_registry, retro_institutions_to_connect)
     
-            retro_journal_items = [JournalItem.from_retro(e) for e in tqdm(records_prep) if e['rec_type']=='ART']
-            last_number = give_fake_id(retro_journal_items, last_number, retro=True, retro_filename=filename)
+            retro_journal_items = (JournalItem.from_retro(e) for e in tqdm(records_prep) if e['rec_type']=='ART')
+            retro_journal_items = RecordStore(JournalItem, retro_journal_items) if records_store else list(retro_journal_items)
+            fake_ids.assign(retro_journal_items, 'journal_items', retro=True, retro_filename=filename)
     
-            for journal_item in tqdm(retro_journal_items):
-                journal_item.connect_with_persons(retro_persons_to_connect)
-                journal_item.connect_with_journals(retro_journals_to_connect)
+            if records_store:
+                retro_journal_items.connect_with_persons(retro_persons_to_connect)
+                retro_journal_items.connect_with_journals(retro_journals_to_connect)
+            else:
+                for journal_item in tqdm(retro_journal_items):
+                    journal_item.connect_with_persons(retro_persons_to_connect)
+                    journal_item.connect_with_journals(retro_journals_to_connect)
             
             # xml creation
+            retro_export_path = f'./xml_output/retro/{filename}'
+            retro_jobs = []
             # places
-            step = 50000
-            for idx, sublist in enumerate([retro_places[i:i + step] for i in range(0, len(retro_places), step)]):
-                places_xml = ET.Element('pbl')
-                files_node = ET.SubElement(places_xml, 'files')
-                places_node = ET.SubElement(files_node, 'places')
-                for place in tqdm(sublist):
-                    places_node.append(place.to_xml())
-        
-                tree = ET.ElementTree(places_xml)
-                ET.indent(tree, space="\t", level=0)
-                tree.write(f'./xml_output/retro/{filename}/import_retro_places_{filename}_{idx}.xml', encoding='UTF-8')
-    
+            retro_jobs += export_jobs(retro_places, retro_export_path, 'places', 50000, export_max_bytes, export_workers, prefix='import_retro', suffix=f'_{filename}')
             # persons
-            step = 50000
-            for idx, sublist in enumerate([retro_persons[i:i + step] for i in range(0, len(retro_persons), step)]):
-                persons_xml = ET.Element('pbl')
-                files_node = ET.SubElement(persons_xml, 'files')
-                people_node = ET.SubElement(files_node, 'people')
-                for person in tqdm(sublist):
-                    people_node.append(person.to_xml())
-        
-                tree = ET.ElementTree(persons_xml)
-                ET.indent(tree, space="\t", level=0)
-                tree.write(f'./xml_output/retro/{filename}/import_retro_people_{filename}_{idx}.xml', encoding='UTF-8')
-    
+            retro_jobs += export_jobs(retro_persons, retro_export_path, 'people', 50000, export_max_bytes, export_workers, prefix='import_retro', suffix=f'_{filename}')
             # institutions
-            step = 50000
-            for idx, sublist in enumerate([retro_institutions[i:i + step] for i in range(0, len(retro_institutions), step)]):
-                institutions_xml = ET.Element('pbl')
-                files_node = ET.SubElement(institutions_xml, 'files')
-                institutions_node = ET.SubElement(files_node, 'institutions')
-                for institution in tqdm(sublist):
-                    institutions_node.append(institution.to_xml())
-        
-                tree = ET.ElementTree(institutions_xml)
-                ET.indent(tree, space="\t", level=0)
-                tree.write(f'./xml_output/retro/{filename}/import_retro_institutions_{filename}_{idx}.xml', encoding='UTF-8')
-    
+            retro_jobs += export_jobs(retro_institutions, retro_export_path, 'institutions', 50000, export_max_bytes, export_workers, prefix='import_retro', suffix=f'_{filename}')
             # journals
-            step = 50000
-            for idx, sublist in enumerate([retro_journals[i:i + step] for i in range(0, len(retro_journals), step)]):
-                journals_xml = ET.Element('pbl')
-                files_node = ET.SubElement(journals_xml, 'files')
-                journals_node = ET.SubElement(files_node, 'journals')
-                journals_years_node = ET.SubElement(files_node, 'journal-years')
-                journals_numbers_node = ET.SubElement(files_node, 'journal-numbers')
-                for journal in tqdm(sublist):
-                    journals_node.append(journal.to_xml())
-                    for year_xml in journal.years_to_xml():
-                        journals_years_node.append(year_xml)
-                    for number_xml in journal.numbers_to_xml():
-                        journals_numbers_node.append(number_xml)
-                  
-                tree = ET.ElementTree(journals_xml)
-                ET.indent(tree, space="\t", level=0)
-                tree.write(f'./xml_output/retro/{filename}/import_retro_journals_{filename}_{idx}.xml', encoding='UTF-8')
-    
+            retro_jobs += export_jobs(retro_journals, retro_export_path, 'journals', 50000, export_max_bytes, export_workers, prefix='import_retro', suffix=f'_{filename}')
             # journal items
-            step = 50000
-            for idx, sublist in enumerate([retro_journal_items[i:i + step] for i in range(0, len(retro_journal_items), step)]):
-                records_xml = ET.Element('pbl')
-                files_node = ET.SubElement(records_xml, 'records')
-                journal_items_node = ET.SubElement(files_node, 'journal-items')
-                for journal_item in tqdm(sublist):
-                    journal_items_node.append(journal_item.to_xml())
-        
-                tree = ET.ElementTree(records_xml)
-                ET.indent(tree, space="\t", level=0)
-                tree.write(f'./xml_output/retro/{filename}/import_retro_journal_items_{filename}_{idx}.xml', encoding='UTF-8')
-    
+            retro_jobs += export_jobs(retro_journal_items, retro_export_path, 'journal_items', 50000, export_max_bytes, export_workers, prefix='import_retro', suffix=f'_{filename}')
             # books
-            step = 50000
-            for idx, sublist in enumerate([retro_books[i:i + step] for i in range(0, len(retro_books), step)]):
-                records_xml = ET.Element('pbl')
-                files_node = ET.SubElement(records_xml, 'records')
-                books_node = ET.SubElement(files_node, 'books')
-                for book in tqdm(sublist):
-                    books_node.append(book.to_xml())
-                    
-                tree = ET.ElementTree(records_xml)
-                ET.indent(tree, space="\t", level=0)
-                tree.write(f'./xml_output/retro/{filename}/import_retro_books_{filename}_{idx}.xml', encoding='UTF-8')
+            retro_jobs += export_jobs(retro_books, retro_export_path, 'books', 50000, export_max_bytes, export_workers, prefix='import_retro', suffix=f'_{filename}')
+            export_shards(retro_jobs, export_workers, run_report)
+            fake_ids.save()
+
 
+# raport uzupełniony o pliki tomów retro
+run_report.save()
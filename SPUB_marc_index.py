@@ -0,0 +1,56 @@
+import regex as re
+from SPUB_additional_functions import parse_mrk
+
+#%% main
+
+class MarcIndex:
+    # fragmenty surowego fullrecord, o które pytają funkcje preprocess_* (np. '264' in fullrecord)
+    # zapamiętujemy je przy parsowaniu, żeby można było usunąć tekst rekordu z biblio
+    probes = ('264', '260', '=490')
+
+    def __init__(self, biblio_data=None, drop_fullrecord=False):
+        self.drop_fullrecord = drop_fullrecord
+        self.records = {}
+        self.subjects = {}
+        self.contained = {}
+        if biblio_data:
+            for record in biblio_data:
+                self.add(record)
+
+    def __repr__(self):
+        return "MarcIndex(records={}, drop_fullrecord={})".format(len(self.records), self.drop_fullrecord)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, rec_id):
+        return rec_id in self.records
+
+    def add(self, record):
+        if not record or 'fullrecord' not in record:
+            return
+        rec_id = record.get('id')
+        fullrecord = record.get('fullrecord')
+        self.records[rec_id] = parse_mrk(fullrecord)
+        # record subjects 650 and 655
+        self.subjects[rec_id] = re.findall('(?<=\=65[05]  ).+?(?=\r\n)', fullrecord)
+        self.contained[rec_id] = frozenset(e for e in self.probes if e in fullrecord)
+        if self.drop_fullrecord:
+            del record['fullrecord']
+
+    def discard(self, rec_id):
+        # usuwa rekord z indeksu (np. rekord biblio, którego nie potrzebuje żaden etap)
+        self.records.pop(rec_id, None)
+        self.subjects.pop(rec_id, None)
+        self.contained.pop(rec_id, None)
+
+    def get(self, rec_id):
+        return self.records.get(rec_id)
+
+    def get_subjects(self, rec_id):
+        return self.subjects.get(rec_id, [])
+
+    def contains(self, rec_id, substring):
+        if substring not in self.probes:
+            raise KeyError(f'{substring} is not indexed, add it to MarcIndex.probes')
+        return substring in self.contained.get(rec_id, ())
@@ -0,0 +1,102 @@
+import gc
+import sys
+import tracemalloc
+
+from SPUB_files_place import Place
+from SPUB_files_person import Person
+from SPUB_files_institutions import Institution
+from SPUB_fiels_event import Event
+from SPUB_files_publishing_series import PublishingSeries
+from SPUB_files_creative_work import CreativeWork
+from SPUB_files_journal import Journal
+from SPUB_records_book import Book
+from SPUB_records_journal_item import JournalItem
+from SPUB_record_store import RecordStore
+
+#%% main
+
+# pamięć zajmowana przez encje (bajty na rekord, tracemalloc): z atrybutami w __dict__, z __slots__ i w RecordStore
+# rekordy są syntetyczne, ale mają typowy zestaw pól wypełnianych przez from_dict
+# uruchomienie: python SPUB_memory_benchmark.py [liczba rekordów]
+
+record_factories = {
+    'places': lambda i: Place(i, '52.40692', '16.92993', name=f'Miejsce {i}'),
+    'people': lambda i: Person(i, i, name=f'Kowalski, Jan {i}', birth_date='1900', death_date='1980', birth_place='268', death_place='270', person_heading='1234'),
+    'institutions': lambda i: Institution(i, i, name=f'Wydawnictwo {i}'),
+    'events': lambda i: Event(i, i, name=f'Festiwal {i}', year='1999', place='Poznań', type_='festival'),
+    'publishing_series_list': lambda i: PublishingSeries(i, title=f'Seria {i}'),
+    'creative_works': lambda i: CreativeWork(i, author_id=i, author_name=f'Kowalski, Jan {i}', title=f'Utwór {i}'),
+    'journals': lambda i: Journal(i, i, title=f'Czasopismo {i}', issn='1234-5678', years_with_numbers_set=[('1999', {'1', '2', '3'}), ('2000', {'1', '2'})]),
+    'journal_items': lambda i: JournalItem(i, title=f'Artykuł {i}', record_types=['article'], authors=[(i, f'Kowalski, Jan {i}')], cocreators=[(i, f'Nowak, Anna {i}', ['translation'])], languages=['polish'], elb_id=f'b{i}', journal_str=f'Czasopismo {i}', journal_year_str='1999', journal_number_str='1', pages='1-10', headings=['1234'], subject_persons=[(i, f'Mickiewicz, Adam {i}')]),
+    'books': lambda i: Book(i, title=f'Książka {i}', record_types=['book'], authors=[(i, f'Kowalski, Jan {i}')], cocreators=[(i, f'Nowak, Anna {i}', ['translation'])], languages=['polish'], elb_id=f'b{i}', publishers={f'p{i}': (f'Wydawnictwo {i}', [{'period': 'Poznań', 'lang': 'pl', 'id': 'http://www.wikidata.org/entity/Q268'}])}, year='1999', physical_description='200 s.', headings=['1234'], subject_persons=[(i, f'Mickiewicz, Adam {i}')]),
+    }
+
+# rekordy także w kolumnowym RecordStore
+record_stores = {
+    'journal_items': JournalItem,
+    'books': Book,
+    }
+
+# punkt odniesienia: te same encje z atrybutami w __dict__ (jak przed __slots__)
+# każda klasa encji i klasa pomocnicza dostaje własną klasę bez __slots__, żeby słowniki jej obiektów dzieliły klucze
+dict_classes = {}
+
+def slot_names(cls):
+    names = []
+    for base in reversed(cls.__mro__):
+        slots = base.__dict__.get('__slots__', ())
+        names += [slots] if isinstance(slots, str) else [e for e in slots if e not in ('__dict__', '__weakref__')]
+    return names
+
+def dict_backed(value, memo=None):
+    # kopia z obiektami bez __slots__; memo zachowuje wspólne obiekty (np. years_index w Journal)
+    memo = {} if memo is None else memo
+    if id(value) in memo:
+        return memo[id(value)]
+    if isinstance(value, list):
+        copy = memo[id(value)] = []
+        copy.extend(dict_backed(e, memo) for e in value)
+    elif isinstance(value, tuple):
+        copy = memo[id(value)] = tuple(dict_backed(e, memo) for e in value)
+    elif isinstance(value, dict):
+        copy = memo[id(value)] = {}
+        copy.update((k, dict_backed(v, memo)) for k, v in value.items())
+    elif hasattr(type(value), '__slots__') and not hasattr(value, '__dict__'):
+        cls = type(value)
+        if cls not in dict_classes:
+            dict_classes[cls] = type(cls.__name__, (), {})
+        copy = memo[id(value)] = dict_classes[cls]()
+        for name in slot_names(cls):
+            if hasattr(value, name):
+                setattr(copy, name, dict_backed(getattr(value, name), memo))
+    else:
+        copy = value
+    return copy
+
+def bytes_per_record(factory, records=10000, container=list):
+    gc.collect()
+    tracemalloc.start()
+    entities = container(factory(i) for i in range(1, records + 1))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del entities
+    return size / records
+
+def memory_benchmark(records=10000):
+    # kolumny: dict (atrybuty w __dict__), slots (klasy encji), RecordStore (tylko rekordy z record_stores)
+    results = {}
+    for kind, factory in record_factories.items():
+        results[kind] = {
+            'dict': bytes_per_record(lambda i: dict_backed(factory(i)), records),
+            'slots': bytes_per_record(factory, records),
+            }
+        if kind in record_stores:
+            results[kind]['RecordStore'] = bytes_per_record(factory, records, lambda entities: RecordStore(record_stores[kind], entities))
+    print(f"{'B/record':<30}{'dict':>10}{'slots':>10}{'RecordStore':>13}")
+    for kind, sizes in results.items():
+        store = f"{sizes['RecordStore']:.0f}" if 'RecordStore' in sizes else '-'
+        print(f"{kind:<30}{sizes['dict']:>10.0f}{sizes['slots']:>10.0f}{store:>13}")
+    return results
+
+if __name__ == '__main__':
+    memory_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,154 @@
+import gc
+import glob
+import hashlib
+import json
+import os
+import pickle
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from SPUB_snapshots import SnapshotStore
+
+#%% main
+
+class Stage:
+    __slots__ = ('name', 'function', 'inputs', 'after', 'sources', 'code', 'checkpoint')
+
+    def __init__(self, name, function, inputs=(), after=(), sources=(), code=(), checkpoint=True):
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.after = tuple(after)
+        self.sources = tuple(sources)
+        self.code = tuple(code)
+        self.checkpoint = checkpoint
+
+    def __repr__(self):
+        return "Stage(name={}, inputs={}, checkpoint={})".format(self.name, self.inputs, self.checkpoint)
+
+class Pipeline:
+    # etapy SPUB_main jako graf: etap dostaje wyniki etapów z inputs (w tej kolejności) jako argumenty
+    # klucz etapu to skrót plików źródłowych (sources), plików kodu (code) i kluczy etapów wejściowych,
+    # więc zmiana pliku albo kodu unieważnia etap i wszystkie etapy od niego zależne
+    # wyniki etapów z checkpoint=True zapisujemy w {path}/{nazwa}_{klucz}.pickle; etap z aktualnym zapisem
+    # jest wczytywany, a jego wejścia nie są w ogóle liczone (checkpoint=False dla etapów z własną pamięcią, np. migawek)
+    # after: etapy, które muszą się skończyć wcześniej, choć ich wyniku nie używamy (np. gdy zmieniają wspólne dane)
+    # etapy niezależne od siebie uruchamiamy równolegle w workers wątkach (1 = po kolei, w kolejności dodania);
+    # przy GIL wątki pomagają tylko etapom czekającym na sieć lub dysk
+    # enabled=False: wszystkie etapy są liczone, bez zapisu
+    # run_report: RunReport, w którym mierzymy wczytywanie zapisanych wyników
+
+    def __init__(self, path='./cache/pipeline', workers=1, enabled=True, snapshots=None, run_report=None):
+        self.path = path
+        self.run_report = run_report
+        self.workers = workers
+        self.enabled = enabled
+        self.snapshots = snapshots if snapshots is not None else SnapshotStore(enabled=False)
+        self.stages = {}
+        self.keys = {}
+        self.stats = Counter()
+        if enabled:
+            os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return "Pipeline(stages={}, workers={}, enabled={})".format(len(self.stages), self.workers, self.enabled)
+
+    def add(self, name, function, inputs=(), after=(), sources=(), code=(), checkpoint=True):
+        # etapy wejściowe muszą być dodane wcześniej, więc graf nie ma cykli
+        if name in self.stages:
+            raise ValueError(f'stage {name} already exists')
+        for dependency in list(inputs) + list(after):
+            if dependency not in self.stages:
+                raise KeyError(f'stage {name}: unknown input stage {dependency}')
+        self.stages[name] = Stage(name, function, inputs, after, sources, code, checkpoint)
+        return self.stages[name]
+
+    def key(self, name):
+        if name not in self.keys:
+            stage = self.stages[name]
+            own_key = self.snapshots.key(name, stage.sources, stage.code)
+            self.keys[name] = hashlib.md5(json.dumps([own_key] + [self.key(e) for e in stage.inputs]).encode('utf-8')).hexdigest()
+        return self.keys[name]
+
+    def checkpoint_path(self, name):
+        return os.path.join(self.path, f'{name}_{self.key(name)}.pickle')
+
+    def plan(self, targets, force=()):
+        # etap -> 'load' (aktualny zapis) albo 'run'; wejścia planujemy tylko dla etapów do uruchomienia
+        plan = {}
+        def visit(name):
+            if name in plan:
+                return
+            stage = self.stages[name]
+            if self.enabled and stage.checkpoint and name not in force and os.path.exists(self.checkpoint_path(name)):
+                plan[name] = 'load'
+                return
+            plan[name] = 'run'
+            for dependency in stage.inputs:
+                visit(dependency)
+        for name in targets:
+            visit(name)
+        return plan
+
+    def run(self, targets=None, force=()):
+        # wyniki etapów z targets (domyślnie wszystkich) i ich uruchomionych wejść
+        targets = list(targets or self.stages)
+        plan = self.plan(targets, force)
+        for name in plan:
+            self.key(name)
+        results = {}
+        for name in [e for e in self.stages if plan.get(e) == 'load']:
+            if self.run_report is not None:
+                with self.run_report.stage(f'load {name}') as stage:
+                    results[name] = self.load(name)
+                    stage['records_out'] = len(results[name]) if hasattr(results[name], '__len__') else None
+            else:
+                results[name] = self.load(name)
+        pending = [e for e in self.stages if plan.get(e) == 'run']
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+            while pending or running:
+                for name in [e for e in pending if self.ready(e, plan, results)]:
+                    if len(running) == self.workers:
+                        break
+                    pending.remove(name)
+                    running[executor.submit(self.execute, name, [results[e] for e in self.stages[name].inputs])] = name
+                if not running:
+                    raise RuntimeError(f'stages {pending} cannot be started')
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+                    self.stats['run'] += 1
+        return results
+
+    def ready(self, name, plan, results):
+        stage = self.stages[name]
+        return all(e in results for e in stage.inputs) and all(e in results or e not in plan for e in stage.after)
+
+    def execute(self, name, args):
+        stage = self.stages[name]
+        value = stage.function(*args)
+        if self.enabled and stage.checkpoint:
+            self.save(name, value)
+        return value
+
+    def load(self, name):
+        self.stats['loaded'] += 1
+        gc.disable()
+        try:
+            with open(self.checkpoint_path(name), 'rb') as f:
+                return pickle.load(f)
+        finally:
+            gc.enable()
+
+    def save(self, name, value):
+        path = self.checkpoint_path(name)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(value, f, protocol=5)
+        os.replace(path + '.tmp', path)
+        for old_path in glob.glob(os.path.join(self.path, f'{name}_*.pickle')):
+            if old_path != path and os.path.basename(old_path)[len(name) + 1:-len('.pickle')].isalnum():
+                os.remove(old_path)
+
+    def report(self):
+        print(f"pipeline stages: {self.stats['loaded']} loaded, {self.stats['run']} run")
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import math
+import os
+from collections import Counter, defaultdict
+import Levenshtein as lev
+
+#%% main
+
+def trigrams(string):
+    return Counter(string[i:i+3] for i in range(len(string) - 2))
+
+def ratio_bound(len_a, len_b, common):
+    # górne ograniczenie lev.ratio = (suma długości - odległość) / suma długości
+    # odległość >= różnica długości oraz (lemat q-gramowy) >= (max długość - 2 - wspólne trigramy) / 3
+    lensum = len_a + len_b
+    if not lensum:
+        return 1.0
+    distance = max(abs(len_a - len_b), math.ceil((max(len_a, len_b) - 2 - common) / 3), 0)
+    return (lensum - distance) / lensum
+
+class PlaceNameIndex:
+    # zastępuje max(places, key=lambda x: lev.ratio(x.get('name'), name)) i zwraca ten sam obiekt:
+    # 1. wynik zapamiętany dla tej samej nazwy
+    # 2. dokładna nazwa -> pierwsze miejsce o tej nazwie (ratio == 1.0)
+    # 3. kandydaci ze wspólnymi trigramami, liczeni lev.ratio w kolejności malejącego ograniczenia górnego,
+    #    aż żaden pozostały (również bez wspólnych trigramów) nie może dorównać najlepszemu
+    # przy remisie wygrywa miejsce wcześniejsze na liście, tak jak w max()
+    # exact=False: liczymy tylko limit najlepszych kandydatów (szybciej, ale wynik może się różnić)
+    # cache_path: dopasowania zapisane między uruchomieniami, ważne tylko dla tej samej listy miejsc
+    def __init__(self, places, exact=True, limit=20, cache_path=None):
+        self.places = list(places)
+        self.names = [e.get('name') for e in self.places]
+        self.exact = exact
+        self.limit = limit
+        self.memo = {}
+        self.seen = set()
+        self.stats = Counter()
+        self.by_name = {}
+        self.grams = defaultdict(list)
+        self.by_length = defaultdict(list)
+        for idx, name in enumerate(self.names):
+            self.by_name.setdefault(name, idx)
+            self.by_length[len(name)].append(idx)
+            for gram, count in trigrams(name).items():
+                self.grams[gram].append((idx, count))
+        self.cache_path = cache_path
+        if cache_path:
+            self.load(cache_path)
+
+    def __repr__(self):
+        return "PlaceNameIndex(places={}, exact={})".format(len(self.places), self.exact)
+
+    def __len__(self):
+        return len(self.places)
+
+    @property
+    def fingerprint(self):
+        # zmiana kartoteki miejsc (nazwy, wiki, kolejność) lub trybu dopasowania unieważnia cache
+        places = json.dumps([self.exact, self.limit, self.places], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.md5(places.encode('utf-8')).hexdigest()
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('fingerprint') == self.fingerprint:
+            self.memo.update(cache.get('matches'))
+
+    def save(self, path=None):
+        path = path or self.cache_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'matches': self.memo}, f, ensure_ascii=False)
+
+    def match(self, name):
+        return self.places[self.match_index_memo(name)] if self.places else None
+
+    def match_index_memo(self, name):
+        # statystyki dla różnych nazw: z cache (zapisane wcześniej) albo policzone teraz; lookups to wszystkie wywołania
+        self.stats['lookups'] += 1
+        if name not in self.seen:
+            self.seen.add(name)
+            self.stats['cached' if name in self.memo else 'resolved'] += 1
+        if name not in self.memo:
+            self.memo[name] = self.match_index(name)
+        return self.memo[name]
+
+    def report(self, stage='places'):
+        print(f"{stage} matches: {self.stats['cached']} names cached, {self.stats['resolved']} resolved ({self.stats['lookups']} lookups)")
+
+    def match_index(self, name):
+        if name in self.by_name:
+            return self.by_name[name]
+        common = Counter()
+        for gram, count in trigrams(name).items():
+            for idx, place_count in self.grams.get(gram, ()):
+                common[idx] += min(count, place_count)
+        length = len(name)
+        candidates = sorted(((ratio_bound(length, len(self.names[idx]), count), idx) for idx, count in common.items()), key=lambda x: (-x[0], x[1]))
+        if not self.exact:
+            candidates = candidates[:self.limit]
+        best_score, best_idx = -1.0, len(self.places)
+        for bound, idx in candidates:
+            if bound < best_score - 1e-9:
+                break
+            best_score, best_idx = self.score(name, idx, best_score, best_idx)
+        if not self.exact and best_idx < len(self.places):
+            return best_idx
+        # miejsca bez wspólnych trigramów: ograniczenie zależy tylko od długości nazwy
+        for place_length, indices in self.by_length.items():
+            if ratio_bound(length, place_length, 0) < best_score - 1e-9:
+                continue
+            for idx in indices:
+                if idx not in common:
+                    best_score, best_idx = self.score(name, idx, best_score, best_idx)
+        return best_idx
+
+    def score(self, name, idx, best_score, best_idx):
+        score = lev.ratio(self.names[idx], name)
+        if score > best_score or (score == best_score and idx < best_idx):
+            return score, idx
+        return best_score, best_idx
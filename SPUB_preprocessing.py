@@ -4,7 +4,10 @@
 #%% import
 import json
 from concurrent.futures import ThreadPoolExecutor
-from SPUB_additional_functions import get_wikidata_label, get_wikidata_coordinates, simplify_string, marc_parser_for_field, parse_mrk, parse_java, get_number
+from SPUB_additional_functions import get_wikidata_label, get_wikidata_labels, get_wikidata_coordinates, simplify_string, marc_parser_for_field, parse_mrk, parse_java, get_number
+from SPUB_marc_index import MarcIndex
+from SPUB_reference_data import get_reference_data, get_headings_resolver
+from SPUB_place_matching import PlaceNameIndex
 from tqdm import tqdm
 import regex as re
 from collections import ChainMap, Counter
@@ -27,17 +30,18 @@ def assign_places_to_publishers(x):
     return temp
 #
 
-def preprocess_places(data):
+def preprocess_places(data, wikidata_cache=None):
     for place in data:
         place['coordinates'] = place['fromWiki']['coordinates'] if place['fromWiki']['coordinates'] else ''
         del place['alterNames'], place['fromWiki'], place['roles'], place['alterLabelsInBiblioRec']
     wikidata_ids = set([e.get('wiki') for e in data if e.get('wiki')])
-    with ThreadPoolExecutor() as executor:
-        wikidata_response = list(tqdm(executor.map(lambda p: get_wikidata_label(p, ['pl', 'en']), wikidata_ids)))
-    wikidata_labels = dict([(a[1:],c) for a,b,c in wikidata_response])
+    wikidata_response = get_wikidata_labels(wikidata_ids, ['pl', 'en'], cache=wikidata_cache)
+    wikidata_labels = dict([(a[1:],c) for a,b,c in wikidata_response if c])
     wikidata_redirection = dict([(a[1:],b[1:]) for a,b,c in wikidata_response])
     data = [dict(e) for e in set([tuple({k:wikidata_labels.get(e.get('wiki'), v) if k == 'name' else v for k,v in e.items() if k != 'recCount'}.items()) for e in data])]
     data = [{k:wikidata_redirection.get(v, '') if k == 'wiki' else v for k,v in e.items()} for e in data]
+    if wikidata_cache is not None:
+        wikidata_cache.report('places')
     return data
 
 def preprocess_people(data, biblio_data):
@@ -45,12 +49,7 @@ def preprocess_people(data, biblio_data):
     # biblio_data = import_biblio
     biblio_data = [e for e in biblio_data if e]
     
-    literature_nationalities = pd.read_excel('./additional_files/literature_nationalities.xlsx')
-    literature_nationalities_dct = {}
-    for idx, row in literature_nationalities.iterrows():
-        for key in [row['dane oryginalne'], row['narodowosc'], row['PBL']]:
-            if not isinstance(row['MD5 haseł osobowych'], float):
-                literature_nationalities_dct[key.lower()] = row['MD5 haseł osobowych']
+    literature_nationalities_dct = get_reference_data()['literature_nationalities']
     
     persons_literatures_dct = {}
     for record in biblio_data:
@@ -78,19 +77,21 @@ def preprocess_people(data, biblio_data):
     
     return output
 
-def preprocess_institutions(data, biblio_data):
+def preprocess_institutions(data, biblio_data, marc_index=None):
     # data = import_corporates
     # biblio_data = import_biblio
     biblio_data = [e for e in biblio_data if e]
+    if marc_index is None:
+        marc_index = MarcIndex(biblio_data)
     
     data = [{k:v for k,v in e.items() if k != 'recCount'} for e in data]
     
     #warunek 'fullrecord' in e do usunięcia, jeśli MG uwzględni to w eksporcie danych w Libri
-    origin_data = [e for e in biblio_data if 'Book' in e.get('format_major') and 'fullrecord' in e and any(el in e.get('fullrecord') for el in ['264', '260'])]
+    origin_data = [e for e in biblio_data if 'Book' in e.get('format_major') and e.get('id') in marc_index and any(marc_index.contains(e.get('id'), el) for el in ['264', '260'])]
     
     publishers = []
     for e in origin_data:
-        el = parse_mrk(e.get('fullrecord'))[0]
+        el = marc_index.get(e.get('id'))[0]
         if el.get('264'):
             publishers.append(el.get('264')[0])
         elif el.get('260'): 
@@ -142,10 +143,12 @@ def preprocess_events(data):
     data = [{'type_' if k=='type' else k:v for k,v in e.items()} for e in data]
     return data
 
-def preprocess_publishing_series(data):
+def preprocess_publishing_series(data, marc_index=None):
     data = [e for e in data if e]
+    if marc_index is None:
+        marc_index = MarcIndex(data)
     #warunek 'fullrecord' in e do usunięcia, jeśli MG uwzględni to w eksporcie danych w Libri
-    data = [e for e in data if 'fullrecord' in e and '=490' in e.get('fullrecord')]
+    data = [e for e in data if marc_index.contains(e.get('id'), '=490')]
     data = [e.get('series') for e in data]
     data = set([ele for sub in [[' ; '.join([el.strip() for el in e[0].split(' ; ')][1:])] if len(e) == 1 and re.findall('\d+ \;', e[0]) else e for e in data] for ele in sub])
     data = set([[el.strip() for el in e.split(';')][0] for e in data])
@@ -222,36 +225,18 @@ def preprocess_journals(biblio_data):
     # [e.update({'years': biblio_journals.get(e.get('name'))}) for e in data]
     # data = [{'title' if k == 'name' else k:v for k,v in e.items()} for e in data]
 
-def preprocess_journal_items(origin_data):
+def preprocess_journal_items(origin_data, marc_index=None):
     origin_data = [e for e in origin_data if e]
-    java_record_types = parse_java(r".\additional_files\pbl_record_types.txt")
-    java_cocreators = parse_java(r".\additional_files\pbl_co-creator_types.txt")
+    if marc_index is None:
+        marc_index = MarcIndex(origin_data)
+    reference_data = get_reference_data()
+    java_record_types = reference_data['record_types']
+    java_cocreators = reference_data['cocreator_types']
+    language_codes = reference_data['language_codes']
+    pbl_cocreators_mapping = reference_data['cocreators_mapping']
     
-    with open(r".\additional_files\language_map_iso639-1.ini", encoding='utf-8') as f:
-        language_codes = {e.split(' = ')[-1].strip(): e.split(' = ')[0].strip() for e in f.readlines() if e}
-    
-    with open('./additional_files/dbn2pbl.json', encoding='utf-8') as jfile_1, open('./additional_files/new_pbl_headings.json', encoding='utf-8') as jfile_2:
-        dbn2pbl = json.load(jfile_1)
-        new_pbl_headings = json.load(jfile_2)
-    
-    pbl_cocreators_mapping = pd.read_excel("./additional_files/co-creators_mapping.xlsx")
-    pbl_cocreators_mapping = {row['to_map']:row['pbl_code'] for idx,row in pbl_cocreators_mapping.iterrows()}
-    
-    origin_data = [e for e in origin_data if 'Journal article' in e.get('format_major') and 'fullrecord' in e]
-    
-    # full record
-    full_recs = {}
-    for rec in origin_data:
-        rec_id = rec.get('id')
-        full = rec.get('fullrecord')
-        full_recs[rec_id] = full
-        
-    # record subjects 650 and 655
-    recs_subs = {}
-    for rec in origin_data:
-        rec_id = rec.get('id')
-        subjects_from_rec = re.findall('(?<=\=65[05]  ).+?(?=\r\n)', rec.get('fullrecord'))
-        recs_subs[rec_id] = subjects_from_rec
+    origin_data = [e for e in origin_data if 'Journal article' in e.get('format_major') and e.get('id') in marc_index]
+    parsed_records = marc_index.records
     
     # authors and cocreators
     authors = {}
@@ -304,74 +289,17 @@ def preprocess_journal_items(origin_data):
     #     if headings_set:
     #         headings[rec_id] = list(headings_set)
     
-    with open('./additional_files/headings650.json', encoding='utf-8') as jfile_1, \
-        open('./additional_files/headings655.json', encoding='utf-8') as jfile_2, \
-        open('./additional_files/new_pbl_headings.json', encoding='utf-8') as jfile_3:
-        headings650 = json.load(jfile_1)
-        headings655 = json.load(jfile_2)
-        new_pbl_headings = json.load(jfile_3)
-        
-    oracle_to_postgresql_df = pd.read_excel('./additional_files/oracle_postgresql.xlsx').fillna('').astype(str)
-    oracle_to_postgresql_dct = {}
-    for idx,row in oracle_to_postgresql_df.iterrows():
-        oracle_id = row['oracle']
-        postgresql_id = postgresql_id = set([e for e in row['postgresql'].split('\n') if e.endswith('.')])
-        if oracle_id and postgresql_id:
-            oracle_to_postgresql_dct.setdefault(oracle_id, set()).update(postgresql_id)
-    oracle_to_postgresql_dct = {k:[new_pbl_headings.get(e) for e in v if new_pbl_headings.get(e)] for k,v in oracle_to_postgresql_dct.items()}
-    
-    oracle_dzialy = pd.read_excel('./additional_files/oracle_dzialy.xlsx').fillna('').astype(str)
-    oracle_dzialy = dict(zip(oracle_dzialy['DZ_NAZWA'].to_list(), oracle_dzialy['DZ_DZIAL_ID'].to_list()))
-    
-    elb_literatures = pd.read_excel('./additional_files/elb_literatures.xlsx').fillna('').astype(str)
-    elb_literatures = dict(zip(elb_literatures['literature'].to_list(), elb_literatures['hash'].to_list()))
-    
-    def get_heading(string, descriptor=True):
-        output_headings = set()
-        if descriptor:
-            if (string := re.search('(?<=..\$a).+?(?=\$2|$)', string)):
-                string = string.group(0)
-                for dct in (headings650, headings655):
-                    heads = [(e['path_str'], ' - '.join([str(h[0]) for h in e['chain']])) for e in dct.get(string, [])]
-                    output_headings.update(heads)
-        return list(output_headings)
-    
+    # hasła przedmiotowe: wspólny, zapamiętujący wyniki HeadingsResolver (SPUB_reference_data)
+    headings_resolver = get_headings_resolver()
     headings = {}
     for rec in origin_data:
         rec_id = rec.get('id')
-        headings_set = set()
-        subjects_from_rec = re.findall('(?<=\=65[05]  ).+?(?=\r\n)', rec.get('fullrecord'))
-        for elem in subjects_from_rec:
-            
-            if '$2ELB' in elem:
-                elb_elem_clean = re.search('(?<=..\$a).+?(?=\$2|$)', elem)
-                if elb_hash := elb_literatures.get(elb_elem_clean):
-                    headings_set.add(elb_hash)
-                continue
-            
-            # nazwa taka sama jak dzialy oracle
-            if elem_clean := re.search('(?<=..\$a).+?(?=\$2|$)', elem):
-                elem_clean = elem_clean.group(0)
-                postgresql_heading_z_dzialu = oracle_dzialy.get(elem_clean)
-                postgresql_heading_z_dzialu = oracle_to_postgresql_dct.get(postgresql_heading_z_dzialu)
-                if postgresql_heading_z_dzialu:
-                    postgresql_heading_z_dzialu = set([e['hash'] for e in postgresql_heading_z_dzialu])
-                    headings_set.update(postgresql_heading_z_dzialu)
-            
-            if '$a' in elem and '$2' in elem or elem.count('$') == 1 and '$a' in elem: # JHP
-                oracle_headings = get_heading(elem)
-                oracle_headings = set([e[1].split(' - ')[0] for e in oracle_headings])
-                postgresql_headings = [oracle_to_postgresql_dct.get(e) for e in oracle_headings if oracle_to_postgresql_dct.get(e)]
-                postgresql_headings = [item for row in postgresql_headings for item in row]
-                postgresql_headings = set([e['hash'] for e in postgresql_headings])
-                headings_set.update(postgresql_headings)
-            else: # deskryptor
-                pass
+        headings_set = headings_resolver.resolve_record(marc_index.get_subjects(rec_id))
         if headings_set:
             headings[rec_id] = list(headings_set)
     # headings end
     
-    records_types = [{e.get('id'): [ele for sub in [el.get('655') for el in parse_mrk(e.get('fullrecord'))] for ele in sub] if [el.get('655') for el in parse_mrk(e.get('fullrecord'))][0] else [el.get('655') for el in parse_mrk(e.get('fullrecord'))]} for e in origin_data]
+    records_types = [{e.get('id'): [ele for sub in [el.get('655') for el in parsed_records[e.get('id')]] for ele in sub] if [el.get('655') for el in parsed_records[e.get('id')]][0] else [el.get('655') for el in parsed_records[e.get('id')]]} for e in origin_data]
     records_types = {list(e.keys())[0]:list(e.values())[0] for e in records_types}
     records_types = {k:[[el.get('$a') for el in marc_parser_for_field(e, '\\$') if '$a' in el][0] if not isinstance(e, type(None)) and '$a' in e else e for e in v] for k,v in records_types.items()}    
     records_types = {k:[java_record_types.get(e) for e in java_record_types if any(e in el.lower() for el in v)] if not isinstance(v[0], type(None)) else [java_record_types.get('inne')] for k,v in records_types.items()}
@@ -379,7 +307,7 @@ def preprocess_journal_items(origin_data):
     
     languages = {e.get('id'): [language_codes.get(el) for el in e.get('language') if language_codes.get(el)] for e in origin_data}
     
-    linked_objects = {e.get('id'): [ele for sub in [el.get('856') for el in parse_mrk(e.get('fullrecord'))] for ele in sub] if [el.get('856') for el in parse_mrk(e.get('fullrecord'))][0] else [el.get('856') for el in parse_mrk(e.get('fullrecord'))] for e in origin_data}
+    linked_objects = {e.get('id'): [ele for sub in [el.get('856') for el in parsed_records[e.get('id')]] for ele in sub] if [el.get('856') for el in parsed_records[e.get('id')]][0] else [el.get('856') for el in parsed_records[e.get('id')]] for e in origin_data}
     #tutaj wydobyć linki do libri
     linked_objects = {k:[[el.get('$u') for el in marc_parser_for_field(e, '\\$') if '$u' in el][0] if not isinstance(e, type(None)) else e for e in v] for k,v in linked_objects.items()}
     linked_objects = {k: v if v[0] else None for k,v in linked_objects.items()}
@@ -425,7 +353,7 @@ def preprocess_journal_items(origin_data):
     
     return preprocessed_data
 
-def preprocess_books(origin_data, pub_places_data):
+def preprocess_books(origin_data, pub_places_data, marc_index=None, place_matches_path=None):
     
     # path, pub_places_path = r".\elb_input\biblio.json", r".\elb_input\pub_places.json"
     # origin_data, pub_places_data = import_biblio, import_pub_places
@@ -434,31 +362,19 @@ def preprocess_books(origin_data, pub_places_data):
     # origin_data = import_biblio
     # pub_places_data = import_places
     origin_data = [e for e in origin_data if e]
+    if marc_index is None:
+        marc_index = MarcIndex(origin_data)
     
-    java_record_types = parse_java(r".\additional_files\pbl_record_types.txt")
-    java_cocreators = parse_java(r".\additional_files\pbl_co-creator_types.txt")
-    
-    with open(r".\additional_files\language_map_iso639-1.ini", encoding='utf-8') as f:
-        language_codes = {e.split(' = ')[-1].strip(): e.split(' = ')[0].strip() for e in f.readlines() if e}
+    reference_data = get_reference_data()
+    java_record_types = reference_data['record_types']
+    java_cocreators = reference_data['cocreator_types']
+    language_codes = reference_data['language_codes']
+    pbl_cocreators_mapping = reference_data['cocreators_mapping']
     
-    pbl_cocreators_mapping = pd.read_excel("./additional_files/co-creators_mapping.xlsx")
-    pbl_cocreators_mapping = {row['to_map']:row['pbl_code'] for idx,row in pbl_cocreators_mapping.iterrows()}
+    origin_data = [e for e in origin_data if 'Book' in e.get('format_major') and e.get('id') in marc_index and any(marc_index.contains(e.get('id'), el) for el in ['264', '260'])]
     
-    origin_data = [e for e in origin_data if 'Book' in e.get('format_major') and 'fullrecord' in e and any(el in e.get('fullrecord') for el in ['264', '260'])]
-    
-    # full record
-    full_recs = {}
-    for rec in origin_data:
-        rec_id = rec.get('id')
-        full = rec.get('fullrecord')
-        full_recs[rec_id] = full
-        
-    # record subjects 650 and 655
-    recs_subs = {}
-    for rec in origin_data:
-        rec_id = rec.get('id')
-        subjects_from_rec = re.findall('(?<=\=65[05]  ).+?(?=\r\n)', rec.get('fullrecord'))
-        recs_subs[rec_id] = subjects_from_rec
+    # każdy fullrecord jest parsowany tylko raz (MarcIndex), dalej korzystamy z gotowej struktury pole -> wartości
+    parsed_records = marc_index.records
     
     # authors and cocreators
     authors = {}
@@ -519,77 +435,23 @@ def preprocess_books(origin_data, pub_places_data):
     #     dbn2pbl = json.load(jfile_1)
     #     new_pbl_headings = json.load(jfile_2)
     
-    with open('./additional_files/headings650.json', encoding='utf-8') as jfile_1, \
-        open('./additional_files/headings655.json', encoding='utf-8') as jfile_2, \
-        open('./additional_files/new_pbl_headings.json', encoding='utf-8') as jfile_3:
-        headings650 = json.load(jfile_1)
-        headings655 = json.load(jfile_2)
-        new_pbl_headings = json.load(jfile_3)
-        
-    oracle_to_postgresql_df = pd.read_excel('./additional_files/oracle_postgresql.xlsx').fillna('').astype(str)
-    oracle_to_postgresql_dct = {}
-    for idx,row in oracle_to_postgresql_df.iterrows():
-        oracle_id = row['oracle']
-        postgresql_id = postgresql_id = set([e for e in row['postgresql'].split('\n') if e.endswith('.')])
-        if oracle_id and postgresql_id:
-            oracle_to_postgresql_dct.setdefault(oracle_id, set()).update(postgresql_id)
-    oracle_to_postgresql_dct = {k:[new_pbl_headings.get(e) for e in v if new_pbl_headings.get(e)] for k,v in oracle_to_postgresql_dct.items()}
-    
-    oracle_dzialy = pd.read_excel('./additional_files/oracle_dzialy.xlsx').fillna('').astype(str)
-    oracle_dzialy = dict(zip(oracle_dzialy['DZ_NAZWA'].to_list(), oracle_dzialy['DZ_DZIAL_ID'].to_list()))
-    
-    elb_literatures = pd.read_excel('./additional_files/elb_literatures.xlsx').fillna('').astype(str)
-    elb_literatures = dict(zip(elb_literatures['literature'].to_list(), elb_literatures['hash'].to_list()))
-    
-    def get_heading(string, descriptor=True):
-        output_headings = set()
-        if descriptor:
-            if (string := re.search('(?<=..\$a).+?(?=\$2|$)', string)):
-                string = string.group(0)
-                for dct in (headings650, headings655):
-                    heads = [(e['path_str'], ' - '.join([str(h[0]) for h in e['chain']])) for e in dct.get(string, [])]
-                    output_headings.update(heads)
-        return list(output_headings)
-    
+    # hasła przedmiotowe: wspólny, zapamiętujący wyniki HeadingsResolver (SPUB_reference_data)
+    headings_resolver = get_headings_resolver()
     headings = {}
     for rec in origin_data:
         rec_id = rec.get('id')
-        headings_set = set()
-        subjects_from_rec = re.findall('(?<=\=65[05]  ).+?(?=\r\n)', rec.get('fullrecord'))
-        for elem in subjects_from_rec:
-            
-            if '$2ELB' in elem:
-                elb_elem_clean = re.search('(?<=..\$a).+?(?=\$2|$)', elem)
-                if elb_hash := elb_literatures.get(elb_elem_clean):
-                    headings_set.add(elb_hash)
-                continue
-            
-            # nazwa taka sama jak dzialy oracle
-            if elem_clean := re.search('(?<=..\$a).+?(?=\$2|$)', elem):
-                elem_clean = elem_clean.group(0)
-                postgresql_heading_z_dzialu = oracle_dzialy.get(elem_clean)
-                postgresql_heading_z_dzialu = oracle_to_postgresql_dct.get(postgresql_heading_z_dzialu)
-                if postgresql_heading_z_dzialu:
-                    postgresql_heading_z_dzialu = set([e['hash'] for e in postgresql_heading_z_dzialu])
-                    headings_set.update(postgresql_heading_z_dzialu)
-            
-            if '$a' in elem and '$2' in elem or elem.count('$') == 1 and '$a' in elem: # JHP
-                oracle_headings = get_heading(elem)
-                oracle_headings = set([e[1].split(' - ')[0] for e in oracle_headings])
-                postgresql_headings = [oracle_to_postgresql_dct.get(e) for e in oracle_headings if oracle_to_postgresql_dct.get(e)]
-                postgresql_headings = [item for row in postgresql_headings for item in row]
-                postgresql_headings = set([e['hash'] for e in postgresql_headings])
-                headings_set.update(postgresql_headings)
-            else: # deskryptor
-                pass
+        headings_set = headings_resolver.resolve_record(marc_index.get_subjects(rec_id))
         if headings_set:
             headings[rec_id] = list(headings_set)
     # end headings section
     
     
     pub_places_data = [{k:v for k,v in e.items() if k in ['name', 'wiki']} for e in pub_places_data]
+    # zamiast max(pub_places_data, key=lambda x: lev.ratio(...)) dla każdego wystąpienia miejsca
+    # place_matches_path: dopasowania z poprzednich uruchomień, liczone są tylko nowe nazwy
+    pub_places_index = PlaceNameIndex(pub_places_data, cache_path=place_matches_path)
     
-    records_types = [{e.get('id'): [ele for sub in [el.get('655') for el in parse_mrk(e.get('fullrecord'))] for ele in sub] if [el.get('655') for el in parse_mrk(e.get('fullrecord'))][0] else [el.get('655') for el in parse_mrk(e.get('fullrecord'))]} for e in origin_data]
+    records_types = [{e.get('id'): [ele for sub in [el.get('655') for el in parsed_records[e.get('id')]] for ele in sub] if [el.get('655') for el in parsed_records[e.get('id')]][0] else [el.get('655') for el in parsed_records[e.get('id')]]} for e in origin_data]
     # records_types = dict(ChainMap(*records_types))
     records_types = {list(e.keys())[0]:list(e.values())[0] for e in records_types}
     records_types = {k:[[el.get('$a') for el in marc_parser_for_field(e, '\\$') if '$a' in el][0] if not isinstance(e, type(None)) and '$a' in e else e for e in v] for k,v in records_types.items()}
@@ -598,7 +460,7 @@ def preprocess_books(origin_data, pub_places_data):
     
     languages = {e.get('id'): [language_codes.get(el) for el in e.get('language') if language_codes.get(el)] for e in origin_data}
     
-    linked_objects = {e.get('id'): [ele for sub in [el.get('856') for el in parse_mrk(e.get('fullrecord'))] for ele in sub] if [el.get('856') for el in parse_mrk(e.get('fullrecord'))][0] else [el.get('856') for el in parse_mrk(e.get('fullrecord'))] for e in origin_data}
+    linked_objects = {e.get('id'): [ele for sub in [el.get('856') for el in parsed_records[e.get('id')]] for ele in sub] if [el.get('856') for el in parsed_records[e.get('id')]][0] else [el.get('856') for el in parsed_records[e.get('id')]] for e in origin_data}
     #tutaj wydobyć linki do libri
     linked_objects = {k:[[el.get('$u') for el in marc_parser_for_field(e, '\\$') if '$u' in el][0] if not isinstance(e, type(None)) else e for e in v] for k,v in linked_objects.items()}
     linked_objects = {k: v if v[0] else None for k,v in linked_objects.items()}
@@ -607,7 +469,7 @@ def preprocess_books(origin_data, pub_places_data):
     
     publishers_data = {}
     for e in origin_data:
-        el = parse_mrk(e.get('fullrecord'))[0]
+        el = parsed_records[e.get('id')][0]
         if el.get('264'):
             publishers_data.update({e.get('id'): el.get('264')[0]})
         elif el.get('260'): 
@@ -616,11 +478,14 @@ def preprocess_books(origin_data, pub_places_data):
     publishers_data = {k:[el for el in marc_parser_for_field(v, '\\$') if any(x in el for x in ['$a', '$b'])] for k,v in publishers_data.items()}
     
     publishers_data = {k:assign_places_to_publishers(v) for k,v in publishers_data.items()}
-    publishers_data = {k:{ka[:-1] if ka[-1] == ',' else ka[:-2] if ka[-2:] == ' :' else ka[:-2] if ka[-2:] == ' ;' else ka[:-4] if re.findall(r'; \\1$', ka) else ka:[max([el for el in pub_places_data], key=lambda x: lev.ratio(x.get('name'), e)) for e in va] for ka,va in v.items()} for k,v in tqdm(publishers_data.items())}
+    publishers_data = {k:{ka[:-1] if ka[-1] == ',' else ka[:-2] if ka[-2:] == ' :' else ka[:-2] if ka[-2:] == ' ;' else ka[:-4] if re.findall(r'; \\1$', ka) else ka:[pub_places_index.match(e) for e in va] for ka,va in v.items()} for k,v in tqdm(publishers_data.items())}
+    if place_matches_path:
+        pub_places_index.save()
+        pub_places_index.report('publisher places')
     
     publishers_data = {k:{hashlib.md5(bytes(str(tuple((k,tuple(tuple(e.values()) for e in v)))),'utf-8')).hexdigest():(k,v) for k,v in v.items()} for k,v in publishers_data.items()}
     
-    physical_description_data = {e.get('id'): [ele for sub in [el.get('300') for el in parse_mrk(e.get('fullrecord'))] for ele in sub][0] if [el.get('300') for el in parse_mrk(e.get('fullrecord'))][0] else '' for e in origin_data}
+    physical_description_data = {e.get('id'): [ele for sub in [el.get('300') for el in parsed_records[e.get('id')]] for ele in sub][0] if [el.get('300') for el in parsed_records[e.get('id')]][0] else '' for e in origin_data}
     physical_description_data = {k:''.join([list(e.values())[0] for e in marc_parser_for_field(v, '\\$')]) for k,v in physical_description_data.items()}
     
     preprocessed_data = []
@@ -0,0 +1,334 @@
+from array import array
+import pandas as pd
+
+from SPUB_files_place import PlaceRegistry
+from SPUB_records_book import Book
+from SPUB_records_journal_item import JournalItem
+
+#%% columns
+
+# kolumnowy magazyn rekordów (Book, JournalItem) zamiast listy obiektów:
+# - proste atrybuty (id, elb_id, collection, ...) to listy wartości, powtarzające się napisy są współdzielone
+# - listy (headings, languages, ...) to jedna płaska lista wartości + przesunięcia array('q')
+# - obiekty pomocnicze (authors, publishers, title, year, ...) to płaskie kolumny ich __slots__ + przesunięcia
+# wartości, których nie da się tak zapisać (np. napis zamiast listy, lista o zmienionej długości), trafiają do overrides
+
+class ListColumn:
+    __slots__ = ('values', 'offsets', 'overrides')
+
+    def __init__(self):
+        self.values = []
+        self.offsets = array('q', [0])
+        self.overrides = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, items):
+        if not isinstance(items, list):
+            self.overrides[len(self)] = items
+            items = []
+        self.values.extend(items)
+        self.offsets.append(len(self.values))
+
+    def get(self, idx):
+        if idx in self.overrides:
+            value = self.overrides[idx]
+            return list(value) if isinstance(value, list) else value
+        return self.values[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def set(self, idx, items):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        if idx not in self.overrides and isinstance(items, list) and len(items) == end - start:
+            self.values[start:end] = items
+        else:
+            self.overrides[idx] = items
+
+    def take(self, start, end):
+        column = self.empty()
+        column.values = self.values[self.offsets[start]:self.offsets[end]]
+        column.offsets = array('q', (offset - self.offsets[start] for offset in self.offsets[start:end + 1]))
+        column.overrides = {idx - start: value for idx, value in self.overrides.items() if start <= idx < end}
+        return column
+
+    def empty(self):
+        return ListColumn()
+
+    def movable(self):
+        return any(isinstance(value, list) for value in self.overrides.values())
+
+    def compact(self):
+        # przenosi listy z overrides do płaskiej kolumny
+        column = self.empty()
+        for idx in range(len(self)):
+            column.append(self.get(idx))
+        return column
+
+class ObjectListColumn(ListColumn):
+    # values: słownik slot -> płaska lista wartości tego slotu dla wszystkich obiektów
+    # single=True: atrybut z jednym obiektem (title, year) zamiast listy obiektów
+    __slots__ = ('cls', 'single')
+
+    def __init__(self, cls, single=False):
+        super().__init__()
+        self.cls = cls
+        self.single = single
+        self.values = {slot: [] for slot in cls.__slots__}
+
+    def append(self, objects):
+        if self.single:
+            objects = [objects] if isinstance(objects, self.cls) else objects
+        if not isinstance(objects, list) or not all(isinstance(obj, self.cls) for obj in objects):
+            self.overrides[len(self)] = objects
+            objects = []
+        for slot, values in self.values.items():
+            values.extend(getattr(obj, slot) for obj in objects)
+        self.offsets.append(self.offsets[-1] + len(objects))
+
+    def get(self, idx):
+        if idx in self.overrides:
+            value = self.overrides[idx]
+            return list(value) if isinstance(value, list) else value
+        objects = []
+        for pos in range(self.offsets[idx], self.offsets[idx + 1]):
+            obj = self.cls.__new__(self.cls)
+            for slot, values in self.values.items():
+                setattr(obj, slot, values[pos])
+            objects.append(obj)
+        return objects[0] if self.single else objects
+
+    def set(self, idx, objects):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        items = [objects] if self.single and isinstance(objects, self.cls) else objects
+        if idx not in self.overrides and isinstance(items, list) and len(items) == end - start and all(isinstance(obj, self.cls) for obj in items):
+            for slot, values in self.values.items():
+                values[start:end] = [getattr(obj, slot) for obj in items]
+        else:
+            self.overrides[idx] = objects
+
+    def take(self, start, end):
+        column = self.empty()
+        column.values = {slot: values[self.offsets[start]:self.offsets[end]] for slot, values in self.values.items()}
+        column.offsets = array('q', (offset - self.offsets[start] for offset in self.offsets[start:end + 1]))
+        column.overrides = {idx - start: value for idx, value in self.overrides.items() if start <= idx < end}
+        return column
+
+    def empty(self):
+        return ObjectListColumn(self.cls, self.single)
+
+    def movable(self):
+        return any(isinstance(value, (list, self.cls)) for value in self.overrides.values())
+
+    def scalars(self):
+        # wartość pierwszego slotu dla każdego rekordu (title -> value, year -> year), do DataFrame
+        first = self.values[self.cls.__slots__[0]]
+        return [self.overrides[idx] if idx in self.overrides else first[self.offsets[idx]] if self.offsets[idx + 1] > self.offsets[idx] else None for idx in range(len(self))]
+
+#%% store
+
+# układ kolumn dla klas rekordów; pozostałe sloty są zwykłymi kolumnami wartości
+record_layouts = {
+    'Book': {
+        'title': ('object', Book.BookTitle),
+        'year': ('object', Book.BookPublicationYear),
+        'authors': ('objects', Book.BookAuthor),
+        'cocreators': ('objects', Book.BookCoCreator),
+        'subject_persons': ('objects', Book.BookSubjectPerson),
+        'publishers': ('objects', Book.BookPublishingHouse),
+        'record_types': 'list',
+        'languages': 'list',
+        'headings': 'list',
+        'linked_objects': 'list',
+        'tags': 'list',
+        },
+    'JournalItem': {
+        'title': ('object', JournalItem.JournalItemTitle),
+        'authors': ('objects', JournalItem.JournalItemAuthor),
+        'cocreators': ('objects', JournalItem.JournalItemCoCreator),
+        'subject_persons': ('objects', JournalItem.JournalItemSubjectPerson),
+        'sources': ('objects', JournalItem.JournalItemSource),
+        'record_types': 'list',
+        'languages': 'list',
+        'headings': 'list',
+        'linked_objects': 'list',
+        'tags': 'list',
+        },
+    }
+
+class RecordStore:
+    # zachowuje się jak lista rekordów: len, iteracja i indeks zwracają RecordView, wycinek zwraca nowy RecordStore
+    # dzięki temu działa z give_fake_id i export_entities bez zmian
+    # connect_with_persons i connect_with_journals działają na płaskich kolumnach dla wszystkich rekordów naraz
+
+    def __init__(self, record_class, records=()):
+        self.record_class = record_class
+        self.layout = record_layouts[record_class.__name__]
+        self.pool = {}
+        self.length = 0
+        self.columns = {}
+        for slot in record_class.__slots__:
+            kind = self.layout.get(slot, 'value')
+            if kind == 'value':
+                self.columns[slot] = []
+            elif kind == 'list':
+                self.columns[slot] = ListColumn()
+            else:
+                self.columns[slot] = ObjectListColumn(kind[1], single=kind[0] == 'object')
+        for record in records:
+            self.append(record)
+
+    def __repr__(self):
+        return "RecordStore({}, records={})".format(self.record_class.__name__, len(self))
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return (RecordView(self, idx) for idx in range(len(self)))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            indices = range(len(self))[key]
+            if indices.step != 1:
+                return RecordStore(self.record_class, (self.record(idx) for idx in indices))
+            return self.take(indices.start, indices.stop)
+        return RecordView(self, range(len(self))[key])
+
+    def append(self, record):
+        for slot, column in self.columns.items():
+            value = getattr(record, slot)
+            if isinstance(column, list):
+                column.append(self.pool.setdefault(value, value) if isinstance(value, str) else value)
+            else:
+                column.append(value)
+        self.length += 1
+
+    def get(self, idx, name):
+        column = self.columns[name]
+        return column[idx] if isinstance(column, list) else column.get(idx)
+
+    def set(self, idx, name, value):
+        column = self.columns[name]
+        if isinstance(column, list):
+            column[idx] = self.pool.setdefault(value, value) if isinstance(value, str) else value
+        else:
+            column.set(idx, value)
+
+    def record(self, idx):
+        # pełny obiekt rekordu (kopia), zmiany trzeba zapisać przez update
+        record = self.record_class.__new__(self.record_class)
+        for slot in self.columns:
+            setattr(record, slot, self.get(idx, slot))
+        return record
+
+    def update(self, idx, record):
+        for slot in self.columns:
+            self.set(idx, slot, getattr(record, slot))
+
+    def take(self, start, end):
+        store = RecordStore(self.record_class)
+        store.length = max(end - start, 0)
+        store.columns = {slot: column[start:end] if isinstance(column, list) else column.take(start, end) for slot, column in self.columns.items()}
+        return store
+
+    def compact(self):
+        for slot, column in self.columns.items():
+            if not isinstance(column, list) and column.movable():
+                self.columns[slot] = column.compact()
+
+    def frame(self, columns=None):
+        # proste kolumny jako pandas.DataFrame do operacji wektorowych
+        columns = columns or [name for name in ('id', 'title', 'year', 'elb_id', 'collection') if name in self.columns]
+        return pd.DataFrame({name: self.columns[name] if isinstance(self.columns[name], list) else self.columns[name].scalars() for name in columns})
+
+    def connect_with_persons(self, persons_to_connect):
+        # to samo co connect_with_persons każdego rekordu
+        self.compact()
+        for name, id_slot, name_slot, with_headings in (('authors', 'author_id', 'author_name', True), ('cocreators', 'cocreator_id', 'cocreator_name', False), ('subject_persons', 'sub_person_id', 'sub_person_name', True)):
+            column = self.columns[name].values
+            ids, names, headings = column[id_slot], column[name_slot], column.get('headings')
+            for pos, person_id in enumerate(ids):
+                if not person_id:
+                    match_person = persons_to_connect.get(names[pos])
+                    if match_person:
+                        ids[pos] = match_person.id
+                        if with_headings:
+                            headings[pos] = match_person.headings
+                elif with_headings:
+                    match_person = persons_to_connect.get(person_id)
+                    if match_person:
+                        headings[pos] = match_person.headings
+        # nagłówki autorów dotyczą tylko rekordów z jednym genre_major
+        for idx, genre_major in enumerate(self.columns['genre_major']):
+            if genre_major and len(genre_major) == 1:
+                RecordView(self, idx).call('add_authors_headings')
+        self.compact()
+
+    def connect_with_journals(self, journals_to_connect):
+        # to samo co connect_with_journals każdego rekordu (JournalItem)
+        self.compact()
+        sources = self.columns['sources'].values
+        for pos, journal_str in enumerate(sources['journal_str']):
+            if not sources['journal_id'][pos]:
+                match_journal = journals_to_connect.get(journal_str)
+                if match_journal:
+                    sources['journal_id'][pos] = match_journal.id
+                    match_year = match_journal.get_year(sources['journal_year_str'][pos])
+                    if match_year:
+                        sources['journal_year_id'][pos] = match_year.id
+                        match_number = match_journal.get_number(sources['journal_year_str'][pos], sources['journal_number_str'][pos])
+                        if match_number:
+                            sources['journal_number_id'][pos] = match_number.id
+
+    def connect_publisher(self, list_of_places_class, institutions_to_connect):
+        # to samo co connect_publisher każdego rekordu (Book), tylko dla rekordów z wydawcami
+        places_registry = PlaceRegistry.from_places(list_of_places_class)
+        offsets = self.columns['publishers'].offsets
+        for idx in range(len(self)):
+            if offsets[idx + 1] > offsets[idx] or idx in self.columns['publishers'].overrides:
+                RecordView(self, idx).call('connect_publisher', places_registry, institutions_to_connect)
+        self.compact()
+
+class RecordView:
+    # widok jednego rekordu w RecordStore: atrybuty czytane z kolumn i zapisywane do kolumn
+    # obiekty pomocnicze (np. authors) są kopiami, zmiana wymaga przypisania całego atrybutu
+    # metody rekordu działają na zmaterializowanym obiekcie, zmiany wracają do kolumn
+    __slots__ = ('store', 'idx')
+
+    def __init__(self, store, idx):
+        object.__setattr__(self, 'store', store)
+        object.__setattr__(self, 'idx', idx)
+
+    def __repr__(self):
+        return "RecordView({}, {})".format(self.store.record_class.__name__, self.idx)
+
+    def __getattr__(self, name):
+        if name in self.__slots__ or name not in self.store.columns:
+            raise AttributeError(f"'{self.store.record_class.__name__}' record has no attribute '{name}'")
+        return self.store.get(self.idx, name)
+
+    def __setattr__(self, name, value):
+        if name not in self.store.columns:
+            raise AttributeError(f"'{self.store.record_class.__name__}' record has no attribute '{name}'")
+        self.store.set(self.idx, name, value)
+
+    def record(self):
+        return self.store.record(self.idx)
+
+    def call(self, method, *args):
+        record = self.record()
+        result = getattr(record, method)(*args)
+        self.store.update(self.idx, record)
+        return result
+
+    def connect_with_persons(self, persons_to_connect):
+        return self.call('connect_with_persons', persons_to_connect)
+
+    def connect_with_journals(self, journals_to_connect):
+        return self.call('connect_with_journals', journals_to_connect)
+
+    def connect_publisher(self, list_of_places_class, institutions_to_connect):
+        return self.call('connect_publisher', list_of_places_class, institutions_to_connect)
+
+    def to_xml(self):
+        return self.record().to_xml()
@@ -5,6 +5,7 @@ from datetime import datetime
 import xml.etree.cElementTree as ET
 
 from SPUB_additional_functions import get_wikidata_label, get_wikidata_coordinates, simplify_string, marc_parser_for_field, parse_mrk, parse_java, get_number
+from SPUB_files_place import PlaceRegistry
 
 # na późńiej --> książki przedmiotowe dostają typ 'other', to jest do ulepszenia
 
@@ -15,6 +16,8 @@ CocreatorsList = list[tuple[str, str, tuple[str]]]
 # dodac wydanie -> <edition>Jakiś tekst</edition>
 
 class Book:
+    __slots__ = ('id', 'creator', 'status', 'date', 'publishing_date', 'origin', 'flags', 'elb_id', 'title', 'type', 'record_types', 'authors', 'cocreators', 'general_materials', 'languages', 'headings', 'linked_objects', 'publishers', 'year', 'physical_description', 'annotation', 'tags', 'collection', 'genre_major', 'subject_persons')
+    
     def __init__(self, id_, title='', record_types=None, authors: AuthorsList|None = None, cocreators: CocreatorsList|None = None, languages=None, linked_ids=None, elb_id=None, physical_description='', publishers=None, year='', annotation='', tags=None, type_='authorsBook', collection=None, headings=None, genre_major=None, subject_persons=None, **kwargs):
         self.id = f"http://www.wikidata.org/entity/Q{id_}" if id_ else None
         self.creator = 'cezary_rosinski'
@@ -87,6 +90,7 @@ class Book:
         else: self.subject_persons = []
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -120,6 +124,7 @@ class Book:
                     
     
     class BookAuthor(XmlRepresentation):
+        __slots__ = ('author_id', 'juvenile', 'co_creator', 'principal', 'author_name', 'headings')
         
         def __init__(self, author_id, author_name):
             self.author_id = f"http://www.wikidata.org/entity/Q{author_id}" if author_id else ''
@@ -133,6 +138,7 @@ class Book:
             return "BookAuthor('{}', '{}')".format(self.author_id, self.author_name)
         
     class BookCoCreator(XmlRepresentation):
+        __slots__ = ('cocreator_id', 'types', 'cocreator_name')
         # rozwiazac problem typow wspoltworstwa
         def __init__(self, cocreator_id, cocreator_name, cocreator_roles=None):
             self.cocreator_id = f"http://www.wikidata.org/entity/Q{cocreator_id}" if cocreator_id else ''
@@ -146,6 +152,7 @@ class Book:
             return "BookCoCreator('{}', '{}')".format(self.cocreator_id, self.cocreator_name)
         
     class BookSubjectPerson:
+        __slots__ = ('sub_person_id', 'sub_person_name', 'headings')
         
         def __init__(self, sub_person_id, sub_person_name):
             self.sub_person_id = f"http://www.wikidata.org/entity/Q{sub_person_id}" if sub_person_id else ''
@@ -156,6 +163,7 @@ class Book:
             return "BookSubjectPerson('{}', '{}')".format(self.sub_person_id, self.sub_person_name)
     
     class BookTitle(XmlRepresentation):
+        __slots__ = ('value', 'code', 'newest', 'transliteration')
         
         def __init__(self, value):
             self.value = value
@@ -167,9 +175,10 @@ class Book:
             return "BookTitle('{}')".format(self.value) 
         
     class BookLinkedObejct(XmlRepresentation):
-        pass
+        __slots__ = ()
     
     class BookPublishingHouse(XmlRepresentation):
+        __slots__ = ('publisher_id', 'institution_name', 'institution_id', 'places')
         
         def __init__(self, publisher_id, publisher_value):
             self.publisher_id = publisher_id
@@ -181,6 +190,7 @@ class Book:
             return "BookPublishingHouse('{}', '{}', '{}')".format(self.institution_id, self.institution_name, self.places)
     
     class BookPublicationYear(XmlRepresentation):
+        __slots__ = ('year', 'uncertain', 'explanation', 'type')
         
         def __init__(self, year):
             self.year = year
@@ -202,15 +212,18 @@ class Book:
         return cls(**retro_book_dict, collection='polska-bibliografia-literacka-1944-1988')  
     
     def connect_with_places(self, publisher_instance, list_of_places_class):
+        places_registry = PlaceRegistry.from_places(list_of_places_class)
         for i, place in enumerate(publisher_instance.places):
             if (wiki_id:=place.get('wiki')):
-                correct_place = [e for e in list_of_places_class if f'http://www.wikidata.org/entity/Q{wiki_id}' == e.id]
+                correct_place = places_registry.get(f'http://www.wikidata.org/entity/Q{wiki_id}')
+                correct_place = (correct_place, correct_place.periods[0]) if correct_place else None
             else:
-                correct_place = [e for e in list_of_places_class if [el for el in e.periods if el.name == place.get('name')]]
+                correct_place = places_registry.find_period(place.get('name'), self.year.year if self.year else None)
             if correct_place:
-                publisher_instance.places[i] = {'id': correct_place[0].id,
-                                                'period': f'{correct_place[0].periods[0].date_from}❦{correct_place[0].periods[0].date_to}',
-                                                'lang': correct_place[0].periods[0].lang}
+                correct_place, period = correct_place
+                publisher_instance.places[i] = {'id': correct_place.id,
+                                                'period': f'{period.date_from}❦{period.date_to}',
+                                                'lang': period.lang}
     
     def connect_with_institutions(self, publisher_instance, institutions_to_connect):
         correct_institution = institutions_to_connect.get(publisher_instance.institution_name)
@@ -218,8 +231,9 @@ class Book:
             publisher_instance.institution_id = correct_institution
             
     def connect_publisher(self, list_of_places_class, institutions_to_connect):
+        places_registry = PlaceRegistry.from_places(list_of_places_class)
         for publisher in self.publishers:
-            self.connect_with_places(publisher, list_of_places_class)
+            self.connect_with_places(publisher, places_registry)
             self.connect_with_institutions(publisher, institutions_to_connect)
     
     def add_authors_headings(self):
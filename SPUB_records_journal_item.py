@@ -9,6 +9,7 @@ AuthorsList = list[tuple[str, str]]
 CocreatorsList = list[tuple[str, str, tuple[str]]]
 
 class JournalItem:
+    __slots__ = ('id', 'creator', 'status', 'date', 'publishing_date', 'origin', 'flags', 'elb_id', 'title', 'record_types', 'authors', 'cocreators', 'general_materials', 'languages', 'headings', 'linked_objects', 'sources', 'annotation', 'tags', 'collection', 'genre_major', 'subject_persons')
     
     def __init__(self, id_, title='', record_types=None, authors: AuthorsList|None = None, cocreators: CocreatorsList|None = None, languages=None, linked_ids=None, elb_id=None, journal_str='', journal_year_str='', journal_number_str='', pages='', annotation='', tags='', collection=None, headings=None, genre_major=None, subject_persons=None, **kwargs):
         self.id = f"http://www.wikidata.org/entity/Q{id_}" if id_ else None
@@ -74,6 +75,7 @@ class JournalItem:
         else: self.subject_persons = []
         
     class XmlRepresentation:
+        __slots__ = ()
         
         def to_xml(self):
             match self.__class__.__name__:
@@ -106,6 +108,7 @@ class JournalItem:
                     pass
     
     class JournalItemAuthor(XmlRepresentation):
+        __slots__ = ('author_id', 'juvenile', 'co_creator', 'principal', 'author_name', 'headings')
         
         def __init__(self, author_id, author_name):
             self.author_id = f"http://www.wikidata.org/entity/Q{author_id}" if author_id else ''
@@ -119,6 +122,7 @@ class JournalItem:
             return "JournalItemAuthor('{}', '{}')".format(self.author_id, self.author_name)
     
     class JournalItemCoCreator(XmlRepresentation):
+        __slots__ = ('cocreator_id', 'types', 'cocreator_name')
         # rozwiazac problem typow wspoltworstwa
         def __init__(self, cocreator_id, cocreator_name, cocreator_roles=None):
             self.cocreator_id = f"http://www.wikidata.org/entity/Q{cocreator_id}" if cocreator_id else ''
@@ -132,6 +136,7 @@ class JournalItem:
             return "JournalItemCoCreator('{}', '{}')".format(self.cocreator_id, self.cocreator_name)
     
     class JournalItemSubjectPerson:
+        __slots__ = ('sub_person_id', 'sub_person_name', 'headings')
         
         def __init__(self, sub_person_id, sub_person_name):
             self.sub_person_id = f"http://www.wikidata.org/entity/Q{sub_person_id}" if sub_person_id else ''
@@ -142,6 +147,7 @@ class JournalItem:
             return "JournalItemSubjectPerson('{}', '{}')".format(self.sub_person_id, self.sub_person_name)
     
     class JournalItemTitle(XmlRepresentation):
+        __slots__ = ('value', 'code', 'newest', 'transliteration')
         
         def __init__(self, value):
             self.value = value
@@ -154,6 +160,7 @@ class JournalItem:
     #dodać później współautorów
     
     class JournalItemSource(XmlRepresentation):
+        __slots__ = ('journal_str', 'journal_year_str', 'journal_number_str', 'journal_id', 'journal_year_id', 'journal_number_id', 'pages')
         
         def __init__(self, journal_str ='', journal_year_str='', journal_number_str='', journal_id='', journal_year_id='', journal_number_id='', pages=''):
             self.journal_str = journal_str
@@ -170,7 +177,7 @@ class JournalItem:
             return "JournalItemSource('{}', '{}', '{}', '{}', '{}', '{}', '{}')".format(self.journal_str, self.journal_year_str, self.journal_number_str, self.journal_id, self.journal_year_id, self.journal_number_id, self.pages) 
         
     class JournalItemLinkedObejct(XmlRepresentation):
-        pass
+        __slots__ = ()
     
     @classmethod
     def from_dict(cls, journal_items_dict):
@@ -230,12 +237,12 @@ class JournalItem:
                 match_journal = journals_to_connect.get(source.journal_str)
                 if match_journal:
                     source.journal_id = match_journal.id
-                    match_year = [e for e in match_journal.years if e.year == source.journal_year_str]
+                    match_year = match_journal.get_year(source.journal_year_str)
                     if match_year:
-                       source.journal_year_id = match_year[0].id
-                       match_number = [e for e in match_year[0].numbers if e.number == source.journal_number_str]
+                       source.journal_year_id = match_year.id
+                       match_number = match_journal.get_number(source.journal_year_str, source.journal_number_str)
                        if match_number:
-                           source.journal_number_id = match_number[0].id
+                           source.journal_number_id = match_number.id
     
 
     def to_xml(self):
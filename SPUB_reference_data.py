@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from collections import Counter
+import pandas as pd
+import regex as re
+
+from SPUB_additional_functions import parse_java
+from SPUB_snapshots import SnapshotStore
+
+#%% main
+
+# pliki z additional_files używane przez preprocess_*, zamieniane na gotowe słowniki
+reference_files = {
+    'record_types': 'pbl_record_types.txt',
+    'cocreator_types': 'pbl_co-creator_types.txt',
+    'language_codes': 'language_map_iso639-1.ini',
+    'cocreators_mapping': 'co-creators_mapping.xlsx',
+    'headings650': 'headings650.json',
+    'headings655': 'headings655.json',
+    'new_pbl_headings': 'new_pbl_headings.json',
+    'oracle_postgresql': 'oracle_postgresql.xlsx',
+    'oracle_dzialy': 'oracle_dzialy.xlsx',
+    'elb_literatures': 'elb_literatures.xlsx',
+    'literature_nationalities': 'literature_nationalities.xlsx',
+    }
+
+def load_json_file(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def load_language_codes(path):
+    with open(path, encoding='utf-8') as f:
+        return {e.split(' = ')[-1].strip(): e.split(' = ')[0].strip() for e in f.readlines() if e}
+
+def load_oracle_to_postgresql(path, new_pbl_headings):
+    oracle_to_postgresql = pd.read_excel(path).fillna('').astype(str)
+    oracle_to_postgresql_dct = {}
+    for oracle_id, postgresql in zip(oracle_to_postgresql['oracle'], oracle_to_postgresql['postgresql']):
+        postgresql_id = set([e for e in postgresql.split('\n') if e.endswith('.')])
+        if oracle_id and postgresql_id:
+            oracle_to_postgresql_dct.setdefault(oracle_id, set()).update(postgresql_id)
+    return {k:[new_pbl_headings.get(e) for e in v if new_pbl_headings.get(e)] for k,v in oracle_to_postgresql_dct.items()}
+
+def load_literature_nationalities(path):
+    literature_nationalities = pd.read_excel(path)
+    literature_nationalities_dct = {}
+    for row in zip(literature_nationalities['dane oryginalne'], literature_nationalities['narodowosc'], literature_nationalities['PBL'], literature_nationalities['MD5 haseł osobowych']):
+        for key in row[:3]:
+            if not isinstance(row[3], float):
+                literature_nationalities_dct[key.lower()] = row[3]
+    return literature_nationalities_dct
+
+def compile_reference_data(path='./additional_files'):
+    files = {name: os.path.join(path, filename) for name, filename in reference_files.items()}
+    reference_data = {
+        'record_types': parse_java(files['record_types']),
+        'cocreator_types': parse_java(files['cocreator_types']),
+        'language_codes': load_language_codes(files['language_codes']),
+        'headings650': load_json_file(files['headings650']),
+        'headings655': load_json_file(files['headings655']),
+        'new_pbl_headings': load_json_file(files['new_pbl_headings']),
+        'literature_nationalities': load_literature_nationalities(files['literature_nationalities']),
+        }
+    cocreators_mapping = pd.read_excel(files['cocreators_mapping'])
+    reference_data['cocreators_mapping'] = dict(zip(cocreators_mapping['to_map'], cocreators_mapping['pbl_code']))
+    reference_data['oracle_postgresql'] = load_oracle_to_postgresql(files['oracle_postgresql'], reference_data['new_pbl_headings'])
+    oracle_dzialy = pd.read_excel(files['oracle_dzialy']).fillna('').astype(str)
+    reference_data['oracle_dzialy'] = dict(zip(oracle_dzialy['DZ_NAZWA'].to_list(), oracle_dzialy['DZ_DZIAL_ID'].to_list()))
+    elb_literatures = pd.read_excel(files['elb_literatures']).fillna('').astype(str)
+    reference_data['elb_literatures'] = dict(zip(elb_literatures['literature'].to_list(), elb_literatures['hash'].to_list()))
+    return reference_data
+
+reference_data = None
+# etapy preprocess_* działają w wątkach Pipeline, więc słowniki i resolver tworzymy pod blokadą (raz na proces)
+reference_data_lock = threading.Lock()
+
+def get_reference_data(path='./additional_files', snapshots=None):
+    # jeden zestaw słowników na proces, wspólny dla wszystkich etapów; słowników nie należy modyfikować
+    # skompilowane dane są zapisane w migawce i budowane ponownie tylko po zmianie któregoś pliku (lub kodu ładującego)
+    global reference_data
+    with reference_data_lock:
+        if reference_data is None or snapshots is not None:
+            snapshots = snapshots if snapshots is not None else SnapshotStore()
+            sources = [os.path.join(path, filename) for filename in reference_files.values()]
+            reference_data = snapshots.load('reference_data', sources, lambda: compile_reference_data(path), code=[compile_reference_data, parse_java])
+        return reference_data
+
+#%% headings
+
+class HeadingsResolver:
+    # pole 650/655 rekordu (np. '\\7$aPoezja polska$2DBN') -> hashe haseł PostgreSQL
+    # wynik dla każdego pola liczony raz i zapamiętany, te same deskryptory powtarzają się w całym biblio
+    # wynikiem są kolejne zbiory hashy (działy Oracle, potem JHP), dołączane do zbioru rekordu tak jak dotąd,
+    # żeby kolejność haseł w XML się nie zmieniła; zwracanych zbiorów nie należy modyfikować
+    subfield_a = re.compile(r'(?<=..\$a).+?(?=\$2|$)')
+
+    def __init__(self, reference_data):
+        self.headings650 = reference_data['headings650']
+        self.headings655 = reference_data['headings655']
+        self.oracle_to_postgresql = reference_data['oracle_postgresql']
+        self.oracle_dzialy = reference_data['oracle_dzialy']
+        self.elb_literatures = reference_data['elb_literatures']
+        self.memo = {}
+        self.descriptors = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "HeadingsResolver(subjects={})".format(len(self.memo))
+
+    def resolve_record(self, subjects):
+        headings_set = set()
+        for subject in subjects:
+            for part in self.resolve(subject):
+                headings_set.update(part)
+        return headings_set
+
+    def resolve(self, subject):
+        # pod blokadą: z resolvera korzystają równocześnie etapy książek i artykułów
+        with self.lock:
+            if subject in self.memo:
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+                self.memo[subject] = self.resolve_subject(subject)
+            return self.memo[subject]
+
+    def resolve_subject(self, subject):
+        if '$2ELB' in subject:
+            elb_hash = self.elb_literatures.get(self.subfield_a.search(subject))
+            return ({elb_hash},) if elb_hash else ()
+        headings = []
+        # nazwa taka sama jak dzialy oracle
+        if subject_clean := self.subfield_a.search(subject):
+            subject_clean = subject_clean.group(0)
+            postgresql_heading_z_dzialu = self.oracle_to_postgresql.get(self.oracle_dzialy.get(subject_clean))
+            if postgresql_heading_z_dzialu:
+                headings.append(set([e['hash'] for e in postgresql_heading_z_dzialu]))
+            if '$a' in subject and '$2' in subject or subject.count('$') == 1 and '$a' in subject: # JHP
+                headings.append(self.resolve_descriptor(subject_clean))
+        return tuple(headings)
+
+    def resolve_descriptor(self, subject_clean):
+        # hasła Oracle z headings650/655 (pierwszy element łańcucha) -> hashe PostgreSQL
+        if subject_clean not in self.descriptors:
+            oracle_headings = set()
+            for dct in (self.headings650, self.headings655):
+                oracle_headings.update([(e['path_str'], ' - '.join([str(h[0]) for h in e['chain']])) for e in dct.get(subject_clean, [])])
+            oracle_headings = set([e[1].split(' - ')[0] for e in list(oracle_headings)])
+            postgresql_headings = [self.oracle_to_postgresql.get(e) for e in oracle_headings if self.oracle_to_postgresql.get(e)]
+            postgresql_headings = [item for row in postgresql_headings for item in row]
+            self.descriptors[subject_clean] = set([e['hash'] for e in postgresql_headings])
+        return self.descriptors[subject_clean]
+
+    def report(self, stage='headings'):
+        print(f"{stage} subjects: {self.stats['hits']} cached, {self.stats['misses']} resolved")
+
+headings_resolver = None
+headings_resolver_lock = threading.Lock()
+
+def get_headings_resolver():
+    # wspólny dla preprocess_books i preprocess_journal_items (i ich pamięci wyników)
+    global headings_resolver
+    data = get_reference_data()
+    with headings_resolver_lock:
+        if headings_resolver is None or headings_resolver.oracle_dzialy is not data['oracle_dzialy']:
+            headings_resolver = HeadingsResolver(data)
+        return headings_resolver
@@ -0,0 +1,92 @@
+import gc
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+from collections import Counter
+
+#%% main
+
+def file_hash(path, chunk_size=1 << 20):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+class SnapshotStore:
+    # zdekodowane dane wejściowe zapisane jako pickle (protokół 5), wczytywane zamiast JSON przy kolejnych uruchomieniach
+    # klucz migawki to skrót zawartości plików źródłowych i plików kodu, który je przetwarza (code=[funkcje, klasy])
+    # skróty plików zapamiętujemy wg (rozmiar, mtime), więc niezmienionych plików nie czytamy ponownie
+    # enabled=False: zawsze wywołujemy build, bez zapisu migawek
+
+    def __init__(self, path='./cache/snapshots', enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.stats = Counter()
+        self.hashes_path = os.path.join(path, 'hashes.json')
+        self.hashes = {}
+        # etapy Pipeline mogą wczytywać pliki równolegle (wątki)
+        self.lock = threading.Lock()
+        if enabled:
+            os.makedirs(path, exist_ok=True)
+            if os.path.exists(self.hashes_path):
+                with open(self.hashes_path, encoding='utf-8') as f:
+                    self.hashes = json.load(f)
+
+    def __repr__(self):
+        return "SnapshotStore(path={}, enabled={})".format(self.path, self.enabled)
+
+    def source_hash(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.hashes.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = file_hash(path)
+        with self.lock:
+            self.hashes[key] = [stat.st_size, stat.st_mtime_ns, digest]
+            if self.enabled:
+                with open(self.hashes_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.hashes, f)
+        return digest
+
+    def key(self, name, sources, code=()):
+        paths = list(sources) + [inspect.getfile(obj) for obj in code]
+        return hashlib.md5(json.dumps([name] + [self.source_hash(path) for path in paths]).encode('utf-8')).hexdigest()
+
+    def load(self, name, sources, build, code=()):
+        # build() tworzy dane, jeśli nie ma migawki dla bieżących plików; starsze migawki tej nazwy są usuwane
+        if not self.enabled:
+            return build()
+        path = os.path.join(self.path, f'{name}_{self.key(name, sources, code)}.pickle')
+        if os.path.exists(path):
+            self.stats['loaded'] += 1
+            # bez gc wczytywanie wielu małych słowników jest kilka razy szybsze
+            gc.disable()
+            try:
+                with open(path, 'rb') as f:
+                    return pickle.load(f)
+            finally:
+                gc.enable()
+        self.stats['built'] += 1
+        value = build()
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(value, f, protocol=5)
+        os.replace(path + '.tmp', path)
+        for old_path in glob.glob(os.path.join(self.path, f'{name}_*.pickle')):
+            if old_path != path and os.path.basename(old_path)[len(name) + 1:-len('.pickle')].isalnum():
+                os.remove(old_path)
+        return value
+
+    def load_json(self, path, name=None):
+        def build():
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        return self.load(name or os.path.splitext(os.path.basename(path))[0], [path], build)
+
+    def report(self, stage='inputs'):
+        print(f"{stage} snapshots: {self.stats['loaded']} loaded, {self.stats['built']} built")
@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+#%% main
+
+class WikidataCache:
+    # trwały cache encji Wikidaty (SQLite) wspólny dla wszystkich funkcji get_wikidata_*
+    # encje trzymamy w postaci zwracanej przez wbgetentities, ograniczonej do etykiet i P625
+    # przekierowania (Q stare -> Q nowe) i brakujące encje też są zapamiętywane, każdy wpis ma własny termin ważności
+    day = 24 * 60 * 60
+
+    def __init__(self, path='./cache/wikidata.sqlite', ttl=30*day, missing_ttl=7*day):
+        self.path = path
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS entities (id TEXT PRIMARY KEY, entity TEXT, missing INTEGER, expires REAL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS redirects (id TEXT PRIMARY KEY, target TEXT, expires REAL)')
+
+    def __repr__(self):
+        return "WikidataCache(path={}, entities={})".format(self.path, len(self))
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM entities').fetchone()[0]
+
+    def get(self, wikidata_id):
+        # encja w formacie wbgetentities (z polem 'redirects', jeśli id zostało przekierowane) albo None
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT target, expires FROM redirects WHERE id = ?', (wikidata_id,)).fetchone()
+            target = row[0] if row and row[1] > now else wikidata_id
+            row = self.connection.execute('SELECT entity, missing, expires FROM entities WHERE id = ?', (target,)).fetchone()
+        if not row:
+            self.stats['misses'] += 1
+            return None
+        if row[2] <= now:
+            self.stats['misses'] += 1
+            self.stats['expired'] += 1
+            return None
+        self.stats['hits'] += 1
+        entity = json.loads(row[0])
+        if target != wikidata_id:
+            entity['redirects'] = {'from': wikidata_id, 'to': target}
+        return entity
+
+    def rows(self, wikidata_id, entity, now):
+        wikidata_id = entity.get('redirects', {}).get('from', wikidata_id)
+        if 'missing' in entity:
+            return [(wikidata_id, json.dumps({'id': wikidata_id, 'missing': ''}), 1, now + self.missing_ttl)], []
+        target = entity.get('id', wikidata_id)
+        claims = {k:v for k,v in entity.get('claims', {}).items() if k == 'P625'}
+        entities = [(target, json.dumps({'id': target, 'labels': entity.get('labels', {}), 'claims': claims}, ensure_ascii=False), 0, now + self.ttl)]
+        redirects = [(wikidata_id, target)] if target != wikidata_id else []
+        return entities, redirects
+
+    def put(self, wikidata_id, entity):
+        self.put_many({wikidata_id: entity})
+
+    def put_many(self, entities):
+        now = time.time()
+        entity_rows, redirect_rows = [], []
+        for wikidata_id, entity in entities.items():
+            rows, redirects = self.rows(wikidata_id, entity, now)
+            entity_rows.extend(rows)
+            redirect_rows.extend(redirects)
+        self.put_redirects(redirect_rows)
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)', entity_rows)
+        self.stats['stored'] += len(entity_rows)
+
+    def put_redirects(self, redirects):
+        # redirects: pary (stare id, nowe id)
+        expires = time.time() + self.ttl
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO redirects VALUES (?, ?, ?)', [(a, b, expires) for a, b in redirects])
+
+    def report(self, stage='wikidata'):
+        print(f"{stage} cache: {self.stats['hits']} hits, {self.stats['misses']} misses ({self.stats['expired']} expired)")
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,82 @@
+import bz2
+import gzip
+import json
+import os
+from tqdm import tqdm
+from SPUB_wikidata_cache import WikidataCache
+
+#%% main
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+def read_wikidata_dump(dump_path):
+    # zrzut Wikidaty (latest-all.json[.gz|.bz2]) to tablica JSON z jedną encją w każdej linii
+    with open_dump(dump_path) as f:
+        for line in f:
+            line = line.strip().rstrip(',')
+            if line in ('', '[', ']'):
+                continue
+            yield json.loads(line)
+
+def compact_labels(labels, list_of_languages):
+    # etykiety w wybranych językach + pierwsza pozostała jako zapasowa, jak w parse_wikidata_entity
+    compact = {k:v for k,v in labels.items() if k in list_of_languages}
+    if not compact and labels:
+        first = next(iter(labels))
+        compact[first] = labels[first]
+    return compact
+
+def build_wikidata_index(dump_path, index_path='./cache/wikidata_index.sqlite', list_of_languages=('pl', 'en'), wikidata_ids=None, redirects_path=None, chunk_size=10000):
+    # jednorazowe indeksowanie zrzutu: id -> etykiety, przekierowanie, P625
+    # wikidata_ids ogranicza indeks do potrzebnych encji (np. z places.json)
+    # zrzut encji nie zawiera przekierowań, można je dodać z pliku TSV "stare id\tnowe id"
+    redirects = []
+    if redirects_path:
+        with open_dump(redirects_path) as f:
+            redirects = [tuple(line.rstrip('\n').split('\t')[:2]) for line in f if '\t' in line]
+    if wikidata_ids is not None:
+        wikidata_ids = set(e if e.startswith('Q') else f'Q{e}' for e in wikidata_ids)
+        redirects = [(a, b) for a, b in redirects if a in wikidata_ids]
+        # encje docelowe przekierowań też muszą trafić do indeksu
+        wikidata_ids.update(b for a, b in redirects)
+    index = WikidataCache(index_path, ttl=float('inf'), missing_ttl=float('inf'))
+    index.put_redirects(redirects)
+    chunk = {}
+    for entity in tqdm(read_wikidata_dump(dump_path)):
+        wikidata_id = entity.get('redirects', {}).get('from', entity.get('id'))
+        if wikidata_ids is not None and wikidata_id not in wikidata_ids and entity.get('id') not in wikidata_ids:
+            continue
+        if 'labels' in entity:
+            entity['labels'] = compact_labels(entity.get('labels'), list_of_languages)
+        chunk[wikidata_id] = entity
+        if len(chunk) >= chunk_size:
+            index.put_many(chunk)
+            chunk = {}
+    index.put_many(chunk)
+    index.close()
+    return index_path
+
+class WikidataOfflineIndex(WikidataCache):
+    # indeks zbudowany przez build_wikidata_index, podawany zamiast cache do funkcji get_wikidata_*
+    # nigdy nie zwraca None, więc nie ma zapytań do sieci; brak w indeksie = brakująca encja
+    def __init__(self, path='./cache/wikidata_index.sqlite'):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'{path} does not exist, build it with build_wikidata_index')
+        super().__init__(path, ttl=float('inf'), missing_ttl=float('inf'))
+
+    def __repr__(self):
+        return "WikidataOfflineIndex(path={}, entities={})".format(self.path, len(self))
+
+    def get(self, wikidata_id):
+        entity = super().get(wikidata_id)
+        if entity is None:
+            return {'id': wikidata_id, 'missing': ''}
+        return entity
+
+    def report(self, stage='wikidata'):
+        print(f"{stage} offline index: {self.stats['hits']} found, {self.stats['misses']} missing")
@@ -0,0 +1,211 @@
+import multiprocessing
+import os
+import sys
+import threading
+import warnings
+import xml.etree.cElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+from SPUB_instrumentation import measure_start, measure_end
+
+#%% main
+
+# strumieniowy zapis plików importu:
+# <pbl><files|records><places>...</places>...</files|records></pbl>
+# każdy element encji jest serializowany i zapisywany od razu, więc w pamięci nie ma całego drzewa
+# wynik jest bajt w bajt taki sam jak ET.indent(tree, space="\t", level=0) + tree.write(path, encoding='UTF-8'):
+# encje są na poziomie 3, wcięcia między nimi i wokół kontenerów piszemy ręcznie, puste kontenery są samozamykające
+
+def newline(level, space):
+    return '\n' + level * space if space is not None else ''
+
+def write_element(f, element, level, space='\t'):
+    if space is not None:
+        ET.indent(element, space=space, level=level)
+    ET.ElementTree(element).write(f, encoding='unicode')
+
+def write_section(f, tag, elements, space='\t'):
+    count = 0
+    for element in elements:
+        if not count:
+            f.write(f'<{tag}>')
+        f.write(newline(3, space))
+        write_element(f, element, 3, space)
+        count += 1
+    f.write(f'{newline(2, space)}</{tag}>' if count else f'<{tag} />')
+    return count
+
+def write_pbl_xml(path, group_tag, sections, space='\t'):
+    # group_tag: 'files' (kartoteki) albo 'records' (rekordy)
+    # sections: lista par (tag kontenera, iterowalne elementy ET), np. [('places', (e.to_xml() for e in places))]
+    # space=None zapisuje bez wcięć
+    # plik otwieramy tak jak ElementTree.write (tryb tekstowy, UTF-8, xmlcharrefreplace, bez deklaracji XML)
+    with open(path, 'w', encoding='UTF-8', errors='xmlcharrefreplace') as f:
+        f.write(f'<pbl>{newline(1, space)}<{group_tag}>')
+        for tag, elements in sections:
+            f.write(newline(2, space))
+            write_section(f, tag, elements, space)
+        f.write(f'{newline(1, space)}</{group_tag}>{newline(0, space)}</pbl>')
+    return path
+
+#%% shards
+
+# rodzaje eksportu: (group tag, sekcje jako pary (tag kontenera, nazwa metody encji), domyślna liczba rekordów w pliku)
+export_kinds = {
+    'places': ('files', [('places', 'to_xml')], 10000),
+    'people': ('files', [('people', 'to_xml')], 10000),
+    'institutions': ('files', [('institutions', 'to_xml')], 10000),
+    'events': ('files', [('events', 'to_xml')], 10000),
+    'publishing_series_list': ('files', [('publishing-series-list', 'to_xml')], 10000),
+    'creative_works': ('files', [('creative_works', 'to_xml')], 50000),
+    'journals': ('files', [('journals', 'to_xml'), ('journal-years', 'years_to_xml'), ('journal-numbers', 'numbers_to_xml')], 10000),
+    'journal_items': ('records', [('journal-items', 'to_xml')], 50000),
+    'books': ('records', [('books', 'to_xml')], 50000),
+    }
+
+def entity_elements(entities, method):
+    # method: nazwa metody encji zwracającej element ET albo listę elementów (np. 'to_xml', 'years_to_xml')
+    for entity in entities:
+        elements = getattr(entity, method)()
+        if isinstance(elements, list):
+            yield from elements
+        else:
+            yield elements
+
+def shard_jobs(entities, step, path_pattern, group_tag, sections, space='\t', bounds=None):
+    # path_pattern z polem {idx}, np. './xml_output/import_places_{idx}.xml'
+    # sections: lista par (tag kontenera, nazwa metody), np. [('places', 'to_xml')]
+    # bounds: lista (początek, koniec) kolejnych plików; domyślnie po step encji
+    # zadania zawierają tylko dane i nazwy metod, więc można je przekazać do innego procesu
+    bounds = bounds or [(i, i + step) for i in range(0, len(entities), step)]
+    return [(path_pattern.format(idx=idx), group_tag, [(tag, entities[start:end], method) for tag, method in sections], space)
+            for idx, (start, end) in enumerate(bounds)]
+
+def write_shard(job):
+    path, group_tag, sections, space = job
+    return write_pbl_xml(path, group_tag, [(tag, entity_elements(entities, method)) for tag, entities, method in sections], space)
+
+def write_shard_measured(job):
+    # write_shard z pomiarem w procesie, który zapisuje plik; rekordy = encje pierwszej sekcji
+    start = measure_start()
+    path = write_shard(job)
+    records = len(job[2][0][1])
+    return path, measure_end(start, records, records)
+
+#%% shard size
+
+def text_size(text):
+    # bajty w pliku: UTF-8, a w trybie tekstowym na Windows '\n' zapisuje się jako '\r\n'
+    return len(text.encode('utf-8', errors='xmlcharrefreplace')) + text.count('\n') * (len(os.linesep) - 1)
+
+def entity_size(entity, sections, space='\t'):
+    size = 0
+    for tag, method in sections:
+        for element in entity_elements([entity], method):
+            if space is not None:
+                ET.indent(element, space=space, level=3)
+            size += text_size(newline(3, space) + ET.tostring(element, encoding='unicode'))
+    return size
+
+def measure_entities(job):
+    entities, sections, space = job
+    return [entity_size(entity, sections, space) for entity in entities]
+
+def shard_overhead(group_tag, sections, space='\t'):
+    text = f'<pbl>{newline(1, space)}<{group_tag}>{newline(1, space)}</{group_tag}>{newline(0, space)}</pbl>'
+    text += ''.join(f'{newline(2, space)}<{tag}>{newline(2, space)}</{tag}>' for tag, method in sections)
+    return text_size(text)
+
+def shard_bounds(sizes, max_records, max_bytes, overhead=0):
+    # kolejne encje trafiają do pliku, dopóki mieści się w limicie rekordów i bajtów
+    # encja większa niż max_bytes dostaje osobny plik
+    bounds, start, total = [], 0, overhead
+    for idx, size in enumerate(sizes):
+        if idx > start and (idx - start >= max_records or total + size > max_bytes):
+            bounds.append((start, idx))
+            start, total = idx, overhead
+        total += size
+    if start < len(sizes):
+        bounds.append((start, len(sizes)))
+    return bounds
+
+#%% process pool
+
+# przy fork procesy potomne dziedziczą listę zadań, więc przekazujemy im tylko indeksy (bez kopiowania encji przez pickle)
+fork_jobs = []
+fork_function = None
+
+def run_fork_job(idx):
+    return fork_function(fork_jobs[idx])
+
+def process_pool_context():
+    # fork: procesy potomne dziedziczą stan, niczego nie uruchamiają ponownie; tylko gdy proces nie ma innych wątków,
+    # bo blokada trzymana przez inny wątek (klient HTTP, sqlite) zostaje w procesie potomnym na zawsze
+    # SPUB_main zamyka przed eksportem klienta HTTP i cache Wikidaty, wątek monitora tqdm zatrzymujemy tutaj
+    # (tqdm uruchomi go ponownie przy następnym pasku)
+    # spawn (Windows) importuje w procesie potomnym __main__, więc SPUB_main uruchomiony jako plik wykonałby się od nowa;
+    # wtedy praca idzie sekwencyjnie (z ostrzeżeniem), z konsoli (np. Spyder, bez __file__) pula procesów działa
+    if 'fork' in multiprocessing.get_all_start_methods():
+        if tqdm.monitor is not None:
+            tqdm.monitor.exit()
+        threads = [e.name for e in threading.enumerate() if e is not threading.main_thread() and e.is_alive()]
+        if not threads:
+            return multiprocessing.get_context('fork')
+    else:
+        threads = []
+    main = sys.modules.get('__main__')
+    if getattr(main, '__file__', None) is None and getattr(main, '__spec__', None) is None:
+        return multiprocessing.get_context('spawn')
+    if threads:
+        warnings.warn(f'running threads {threads}, fork is not safe: jobs run sequentially')
+    else:
+        warnings.warn(f'spawn would re-run {main.__file__}: jobs run sequentially (run it from a console for a process pool)')
+    return None
+
+def map_jobs(function, jobs, workers=None):
+    # workers=1 wykonuje zadania po kolei w bieżącym procesie
+    global fork_jobs, fork_function
+    context = process_pool_context() if workers != 1 and len(jobs) > 1 else None
+    if context is None:
+        return [function(job) for job in tqdm(jobs)]
+    if context.get_start_method() == 'fork':
+        fork_jobs, fork_function = jobs, function
+        function, jobs_to_send = run_fork_job, range(len(jobs))
+    else:
+        jobs_to_send = jobs
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            return list(tqdm(executor.map(function, jobs_to_send), total=len(jobs)))
+    finally:
+        fork_jobs, fork_function = [], None
+
+def export_shards(jobs, workers=None, report=None):
+    # każdy plik import_<typ>_<idx>.xml to osobne zadanie
+    # report: RunReport, do którego trafia pomiar każdego pliku
+    if report is None or not report.enabled:
+        return map_jobs(write_shard, jobs, workers)
+    results = map_jobs(write_shard_measured, jobs, workers)
+    for path, metrics in results:
+        report.add({'name': f'export {os.path.basename(path)}', **metrics})
+    return [path for path, metrics in results]
+
+def export_jobs(entities, root_path, kind, max_records=None, max_bytes=None, workers=None, prefix='import', suffix='', space='\t'):
+    # zadania zapisu encji jednego rodzaju do {root_path}/{prefix}_{kind}{suffix}_{idx}.xml
+    # max_records: limit encji w pliku (domyślny z export_kinds); max_bytes: opcjonalny limit rozmiaru pliku
+    # przy max_bytes rozmiar każdej encji jest najpierw mierzony (XML serializowany dwa razy, w workers procesach)
+    # zadania kilku rodzajów łączymy w jedną listę dla export_shards, żeby wszystkie pliki zapisywała jedna pula procesów
+    if kind not in export_kinds:
+        raise KeyError(f'{kind} is not in export_kinds')
+    group_tag, sections, default_records = export_kinds[kind]
+    max_records = max_records or default_records
+    path_pattern = f'{root_path}/{prefix}_{kind}{suffix}_{{idx}}.xml'
+    bounds = None
+    if max_bytes and entities:
+        chunks = [(entities[i:i + 1000], sections, space) for i in range(0, len(entities), 1000)]
+        sizes = [size for chunk in map_jobs(measure_entities, chunks, workers) for size in chunk]
+        bounds = shard_bounds(sizes, max_records, max_bytes, shard_overhead(group_tag, sections, space))
+    return shard_jobs(entities, max_records, path_pattern, group_tag, sections, space, bounds)
+
+def export_entities(entities, root_path, kind, max_records=None, max_bytes=None, workers=None, prefix='import', suffix='', space='\t', report=None):
+    # eksport jednego rodzaju (export_jobs + export_shards)
+    return export_shards(export_jobs(entities, root_path, kind, max_records, max_bytes, workers, prefix, suffix, space), workers, report)